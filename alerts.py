@@ -0,0 +1,201 @@
+import json
+import logging
+from bisect import bisect_right
+from datetime import datetime
+
+# Rule type -> (metric, direction). A rule fires while direction * metric >= direction * value.
+RULE_TYPES = {
+    "price_above": ("price", 1),
+    "price_below": ("price", -1),
+    "day_move": ("day_move", 1),          # |day change| in percent
+    "weight_above": ("weight", 1),        # position value, percent of the portfolio's equity
+    "cost_drawdown": ("cost_drawdown", 1),  # percent below the position's cost basis
+}
+# Checked on every quote; the rest need a portfolio's positions
+QUOTE_METRICS = ("price", "day_move")
+
+ANY_TICKER = "*"
+# Discord rejects messages over 2000 characters
+MESSAGE_LIMIT = 1900
+
+
+class AlertRule:
+    """One configured alert: `ticker` (or '*') `type` `value`.
+
+    `portfolio` limits weight and cost-basis rules to one portfolio; quote
+    rules (price, day move) apply to the ticker wherever it's held.
+    """
+
+    __slots__ = ("id", "ticker", "type", "value", "portfolio", "note", "metric", "direction")
+
+    def __init__(self, ticker, type, value, portfolio=None, note=None, id=None):
+        if type not in RULE_TYPES:
+            raise ValueError(f"unknown alert type {type!r} (expected one of {', '.join(RULE_TYPES)})")
+        self.ticker = ticker.upper() if ticker != ANY_TICKER else ticker
+        self.type = type
+        self.value = float(value)
+        self.portfolio = portfolio
+        self.note = note
+        self.metric, self.direction = RULE_TYPES[type]
+        # Derived ids stay stable across config edits, so dedup state survives reordering
+        self.id = id or f"{self.ticker}:{type}:{self.value:g}" + (f"@{portfolio}" if portfolio else "")
+
+    def describe(self, ticker, observed):
+        text = {
+            "price_above": f"**{ticker}** at ${observed:,.2f}, above ${self.value:,.2f}",
+            "price_below": f"**{ticker}** at ${observed:,.2f}, below ${self.value:,.2f}",
+            "day_move": f"**{ticker}** moved {observed:.2f}% today (limit {self.value:g}%)",
+            "weight_above": f"**{ticker}** is {observed:.1f}% of equity (limit {self.value:g}%)",
+            "cost_drawdown": f"**{ticker}** is {observed:.1f}% below cost basis (limit {self.value:g}%)",
+        }[self.type]
+        return f"{text} — {self.note}" if self.note else text
+
+    def __repr__(self):
+        return f"AlertRule({self.id})"
+
+
+def load_rules(path):
+    """Parse and validate a JSON list of rules; raises ValueError naming the bad entry."""
+    with open(path) as f:
+        raw = json.load(f)
+    if not isinstance(raw, list):
+        raise ValueError(f"{path}: expected a list of rules")
+    rules = []
+    for i, entry in enumerate(raw):
+        try:
+            rules.append(AlertRule(entry["ticker"], entry["type"], entry["value"], portfolio=entry.get("portfolio"),
+                                   note=entry.get("note"), id=entry.get("id")))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"{path}: rule #{i + 1} is invalid: {e}") from e
+    return rules
+
+
+class RuleIndex:
+    """Rules bucketed by (ticker, metric, direction) with thresholds kept sorted.
+
+    A rule fires once the signed metric reaches its signed threshold, so the
+    rules that fire for a value are always a prefix of their bucket: one
+    bisect per bucket, whatever the number of rules.
+    """
+
+    def __init__(self, rules):
+        self.by_id = {rule.id: rule for rule in rules}
+        buckets = {}
+        for rule in rules:
+            buckets.setdefault((rule.ticker, rule.metric, rule.direction), []).append(rule)
+        self._buckets = {}
+        for key, bucket in buckets.items():
+            bucket.sort(key=lambda r: r.direction * r.value)
+            self._buckets[key] = ([r.direction * r.value for r in bucket], bucket)
+        self.tickers = {ticker for ticker, _, _ in buckets}
+
+    def matches(self, ticker, metric, value):
+        fired = []
+        for key_ticker in (ticker, ANY_TICKER):
+            for direction in (1, -1):
+                bucket = self._buckets.get((key_ticker, metric, direction))
+                if bucket is not None:
+                    thresholds, rules = bucket
+                    fired += rules[:bisect_right(thresholds, direction * value)]
+        return fired
+
+
+class AlertEngine:
+    """Checks quotes and positions against the rules and posts newly fired alerts.
+
+    An alert fires once when its condition becomes true, and re-arms when a
+    later check finds it false again. Which alerts are active is kept in
+    `alert_state`, so repeated and resumed scans don't post duplicates.
+    `flush` persists state changes and posts everything new as one message.
+    """
+
+    def __init__(self, db, rules, notifier=None):
+        self.db = db
+        self.index = RuleIndex(rules)
+        self.notifier = notifier
+        self.logger = logging.getLogger()
+        # (ticker, portfolio) -> ids of the rules currently active for it
+        self.active = {}
+        for rule_id, ticker, portfolio in db.conn.execute(
+                "SELECT rule_id, ticker, portfolio FROM alert_state WHERE active = 1"):
+            self.active.setdefault((ticker, portfolio), set()).add(rule_id)
+        self._fired = []
+        self._rearmed = []
+
+    def __len__(self):
+        return len(self.index.by_id)
+
+    def check_quote(self, quote):
+        """Price and day-move rules; last-good (stale) quotes are skipped."""
+        if quote is None or quote.stale:
+            return
+        self._evaluate(quote.ticker, "", {"price": quote.price, "day_move": abs(quote.change_pct)})
+
+    def check_positions(self, portfolio, rows, total_equity):
+        """Weight and cost-basis rules for one portfolio's report rows."""
+        for row in rows:
+            metrics = {}
+            if total_equity > 0:
+                metrics["weight"] = row['value'] / total_equity * 100
+            cost = row['value'] - row['total_gain']
+            if cost > 0:
+                metrics["cost_drawdown"] = -row['total_gain'] / cost * 100
+            self._evaluate(row['ticker'], portfolio, metrics)
+
+    def _evaluate(self, ticker, portfolio, metrics):
+        if ticker not in self.index.tickers and ANY_TICKER not in self.index.tickers:
+            return
+        fired = {}
+        for metric, value in metrics.items():
+            for rule in self.index.matches(ticker, metric, value):
+                if rule.portfolio is None or rule.portfolio == portfolio or rule.metric in QUOTE_METRICS:
+                    fired[rule.id] = (rule, value)
+
+        active = self.active.setdefault((ticker, portfolio), set())
+        for rule_id, (rule, value) in fired.items():
+            if rule_id not in active:
+                active.add(rule_id)
+                self._fired.append((rule, ticker, portfolio, value))
+        # Rules for the metrics just checked that no longer hold can fire again next time
+        for rule_id in [r for r in active if r not in fired]:
+            rule = self.index.by_id.get(rule_id)
+            if rule is None or rule.metric in metrics:
+                active.discard(rule_id)
+                self._rearmed.append((rule_id, ticker, portfolio))
+
+    def flush(self):
+        """Persist state changes and queue one Discord message for the new alerts; returns how many fired."""
+        fired, rearmed = self._fired, self._rearmed
+        self._fired, self._rearmed = [], []
+        if not fired and not rearmed:
+            return 0
+
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.db.conn:
+            self.db.conn.executemany('''
+                INSERT INTO alert_state (rule_id, ticker, portfolio, active, fired_at, value) VALUES (?, ?, ?, 1, ?, ?)
+                ON CONFLICT(rule_id, ticker, portfolio) DO UPDATE SET
+                    active = 1, fired_at = excluded.fired_at, value = excluded.value
+            ''', [(rule.id, ticker, portfolio, now, value) for rule, ticker, portfolio, value in fired])
+            self.db.conn.executemany(
+                "UPDATE alert_state SET active = 0 WHERE rule_id = ? AND ticker = ? AND portfolio = ?", rearmed)
+
+        if fired:
+            lines = [f"🚨 {rule.describe(ticker, value)}" + (f" ({portfolio})" if portfolio else "")
+                     for rule, ticker, portfolio, value in fired]
+            self.logger.info(f"🚨 {len(fired)} alert(s) fired.")
+            if self.notifier is not None:
+                for message in _chunk(lines):
+                    self.notifier.submit(message)
+        return len(fired)
+
+
+def _chunk(lines, limit=MESSAGE_LIMIT):
+    """Join lines into as few messages as fit Discord's length limit."""
+    messages, current = [], ""
+    for line in lines:
+        if current and len(current) + len(line) + 1 > limit:
+            messages.append(current)
+            current = ""
+        current = f"{current}\n{line}" if current else line
+    return messages + [current] if current else messages
@@ -0,0 +1,180 @@
+import math
+
+import numpy as np
+
+import market_calendar
+from compact_db import daily_totals
+
+# Trailing windows, in trading days
+RETURN_WINDOW = 21
+VOL_WINDOW = 20
+TRADING_DAYS_PER_YEAR = 252
+
+
+def refresh_daily_cache(db, portfolio):
+    """Rebuild the per-day analytics rows for days touched by scans since the last refresh.
+
+    `analytics_positions` keeps each ticker's last value and day gain per
+    day, `analytics_days` the day's totals. Only days that gained a scan (or
+    had one rewritten by a resumed run, which moves its finished_at) are
+    recomputed; returns those days.
+    """
+    conn = db.conn
+    state = conn.execute("SELECT last_scan_id, last_finished_at FROM analytics_state WHERE portfolio = ?",
+                         (portfolio,)).fetchone()
+    last_scan, last_finished = conn.execute(
+        "SELECT COALESCE(MAX(id), 0), COALESCE(MAX(finished_at), '') FROM scans WHERE portfolio = ?",
+        (portfolio,)).fetchone()
+
+    if state is None:
+        # First build covers everything, including legacy rows that predate the scans table
+        touched = [r[0] for r in conn.execute(
+            "SELECT DISTINCT date(scan_time) FROM portfolio_history WHERE portfolio = ? "
+            "UNION SELECT day FROM history_daily WHERE portfolio = ?", (portfolio, portfolio))]
+    else:
+        touched = [r[0] for r in conn.execute(
+            "SELECT DISTINCT date(started_at) FROM scans WHERE portfolio = ? AND (id > ? OR finished_at > ?)",
+            (portfolio, state[0], state[1]))]
+
+    with conn:
+        for day in touched:
+            conn.execute("DELETE FROM analytics_positions WHERE portfolio = ? AND day = ?", (portfolio, day))
+            # Each ticker's last row of the day; the range filter keeps this on idx_history_scan_time
+            conn.execute('''
+                INSERT INTO analytics_positions (portfolio, day, ticker, value, day_gain)
+                SELECT ?, ?, ticker, value, COALESCE(value - value / (1 + change_pct / 100.0), 0) FROM (
+                    SELECT ticker, value, change_pct,
+                           ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY scan_time DESC, id DESC) AS rn
+                    FROM portfolio_history
+                    WHERE portfolio = ? AND scan_time >= ? AND scan_time < date(?, '+1 day') AND value IS NOT NULL
+                )
+                WHERE rn = 1
+            ''', (portfolio, day, portfolio, day, day))
+            # Days already compacted by compact_db.py only have their daily row left
+            conn.execute('''
+                INSERT OR IGNORE INTO analytics_positions (portfolio, day, ticker, value, day_gain)
+                SELECT portfolio, day, ticker, value, COALESCE(value - value / (1 + change_pct / 100.0), 0)
+                FROM history_daily
+                WHERE portfolio = ? AND day = ? AND value IS NOT NULL
+            ''', (portfolio, day))
+            conn.execute("DELETE FROM analytics_days WHERE portfolio = ? AND day = ?", (portfolio, day))
+            conn.execute('''
+                INSERT INTO analytics_days (portfolio, day, equity, day_pl)
+                SELECT portfolio, day, SUM(value), SUM(day_gain) FROM analytics_positions
+                WHERE portfolio = ? AND day = ?
+                GROUP BY portfolio, day
+            ''', (portfolio, day))
+        conn.execute('''
+            INSERT INTO analytics_state (portfolio, last_scan_id, last_finished_at) VALUES (?, ?, ?)
+            ON CONFLICT(portfolio) DO UPDATE SET last_scan_id = excluded.last_scan_id,
+                                                 last_finished_at = excluded.last_finished_at
+        ''', (portfolio, last_scan, last_finished))
+    return touched
+
+
+class PerformanceStats:
+    """Return, risk and attribution figures for one portfolio, from its daily history.
+
+    Returns are the day's P&L over the previous day's equity, so deposits
+    and new lots don't count as performance (time-weighted). Contributions
+    are each ticker's share of those daily returns.
+    """
+
+    def __init__(self, days, equity, day_pl, pos_day, pos_ticker, pos_gain, tickers):
+        self.days = days
+        previous = equity - day_pl
+        self.returns = np.divide(day_pl, previous, out=np.zeros_like(day_pl), where=previous > 0)
+
+        growth = np.cumprod(1.0 + self.returns)
+        self.twr_total = float(growth[-1] - 1.0)
+        self.twr_window = float(np.prod(1.0 + self.returns[-RETURN_WINDOW:]) - 1.0)
+        self.drawdown = growth / np.maximum.accumulate(growth) - 1.0
+        self.max_drawdown = float(self.drawdown.min())
+
+        if len(self.returns) >= VOL_WINDOW:
+            windows = np.lib.stride_tricks.sliding_window_view(self.returns, VOL_WINDOW)
+            self.rolling_volatility = windows.std(axis=1, ddof=1) * math.sqrt(TRADING_DAYS_PER_YEAR)
+            self.volatility = float(self.rolling_volatility[-1])
+        else:
+            self.rolling_volatility = np.empty(0)
+            self.volatility = None
+
+        # Per-ticker contribution to each day's return, summed over the trailing window and for the last day
+        contribution = np.divide(pos_gain, previous[pos_day], out=np.zeros_like(pos_gain), where=previous[pos_day] > 0)
+        n_days = len(days)
+        recent = pos_day >= n_days - RETURN_WINDOW
+        self.tickers = tickers
+        self.contribution_window = np.bincount(pos_ticker[recent], weights=contribution[recent], minlength=len(tickers))
+        last = pos_day == n_days - 1
+        self.contribution_today = np.bincount(pos_ticker[last], weights=contribution[last], minlength=len(tickers))
+
+    def top_contributors(self, n=3, window=False):
+        """[(ticker, contribution in percent points)] for the biggest movers up and down."""
+        values = self.contribution_window if window else self.contribution_today
+        order = np.argsort(values)
+        best = [(str(self.tickers[i]), float(values[i]) * 100) for i in order[::-1][:n] if values[i] > 0]
+        worst = [(str(self.tickers[i]), float(values[i]) * 100) for i in order[:n] if values[i] < 0]
+        return best, worst
+
+    def summary_line(self):
+        parts = [f"TWR {RETURN_WINDOW}d {self.twr_window * 100:+.2f}%", f"all {self.twr_total * 100:+.2f}%",
+                 f"max DD {self.max_drawdown * 100:.2f}%"]
+        if self.volatility is not None:
+            parts.append(f"vol {VOL_WINDOW}d {self.volatility * 100:.1f}%")
+        best, worst = self.top_contributors()
+        if best:
+            parts.append("top " + ", ".join(f"{t} {c:+.2f}pp" for t, c in best[:2]))
+        if worst:
+            parts.append("drag " + ", ".join(f"{t} {c:+.2f}pp" for t, c in worst[:2]))
+        return " · ".join(parts)
+
+
+def _trading_day_mask(days):
+    # Weekend and holiday runs repeat the previous session's change; counting them would double it
+    years = range(int(str(days[0])[:4]), int(str(days[-1])[:4]) + 1)
+    holidays = sorted(h for y in years for h in market_calendar.nyse_holidays(y))
+    return np.is_busday(days, holidays=np.array(holidays, dtype="datetime64[D]"))
+
+
+def performance_stats(db, portfolio, archive=None):
+    """Refresh the daily cache and compute `PerformanceStats`; None with under two days of history.
+
+    `archive` is an export loaded with `compact_db.load_archive`; its days
+    before the cache's first day extend the return and drawdown history.
+    """
+    refresh_daily_cache(db, portfolio)
+    conn = db.conn
+
+    day_rows = conn.execute("SELECT day, equity, day_pl FROM analytics_days WHERE portfolio = ? ORDER BY day",
+                            (portfolio,)).fetchall()
+    n = len(day_rows)
+    days = np.fromiter((r[0] for r in day_rows), dtype="datetime64[D]", count=n)
+    equity = np.fromiter((r[1] for r in day_rows), dtype=np.float64, count=n)
+    day_pl = np.fromiter((r[2] for r in day_rows), dtype=np.float64, count=n)
+    if archive is not None:
+        archived_days, archived_equity, archived_pl = daily_totals(archive, portfolio)
+        older = archived_days < days[0] if n else np.ones(len(archived_days), dtype=bool)
+        days = np.concatenate([archived_days[older], days])
+        equity = np.concatenate([archived_equity[older], equity])
+        day_pl = np.concatenate([archived_pl[older], day_pl])
+    if len(days) < 2:
+        return None
+
+    keep = _trading_day_mask(days)
+    if keep.sum() < 2:
+        return None
+    days, equity, day_pl = days[keep], equity[keep], day_pl[keep]
+
+    # Contributions only cover the trailing window, so older position rows aren't read at all
+    since = str(days[-min(RETURN_WINDOW, len(days))])
+    pos_rows = conn.execute("SELECT day, ticker, day_gain FROM analytics_positions WHERE portfolio = ? AND day >= ?",
+                            (portfolio, since)).fetchall()
+    pos_days = np.fromiter((r[0] for r in pos_rows), dtype="datetime64[D]", count=len(pos_rows))
+    tickers, pos_ticker = np.unique(np.array([r[1] for r in pos_rows], dtype=str), return_inverse=True)
+    pos_gain = np.fromiter((r[2] for r in pos_rows), dtype=np.float64, count=len(pos_rows))
+
+    # Map each position row onto the kept-day index; rows on dropped days fall out
+    pos_day = np.searchsorted(days, pos_days)
+    on_day = (pos_day < len(days)) & (days[np.minimum(pos_day, len(days) - 1)] == pos_days)
+    return PerformanceStats(days, equity, day_pl, pos_day[on_day], pos_ticker.reshape(-1)[on_day],
+                            pos_gain[on_day], tickers)
@@ -0,0 +1,237 @@
+"""Offline benchmark: run full scans against a local fake quote server.
+
+Serves synthetic (or recorded) CNBC-style quote pages with configurable
+latency and failure injection, points the Discord webhook at a local sink,
+and runs PortfolioManager's fetch, persistence, rendering and notification
+stages for portfolios of several sizes. Nothing leaves the machine.
+
+    python benchmark.py --sizes 10 100 1000 --latency-ms 40 --fail-rate 0.02
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><title>{ticker} Stock Price</title>
+<script>window.__s_data={state};</script>
+</head><body>
+<div class="QuoteStrip-container">
+  <span class="QuoteStrip-lastPrice">{price:,.2f}</span>
+  <span class="{change_class}">{change:+.2f} ({change_pct:+.2f}%)</span>
+  <div class="QuoteStrip-lastTradeTime">Close {quote_time}</div>
+</div>
+<ul class="Summary-data">
+  <li class="Summary-stat"><span class="Summary-label">Prev Close</span><span class="Summary-value">{prev_close:,.2f}</span></li>
+  <li class="Summary-stat"><span class="Summary-label">Volume</span><span class="Summary-value">{volume:,}</span></li>
+</ul>
+<!-- {padding} -->
+</body></html>"""
+
+
+def synthetic_quote(ticker):
+    """Deterministic per-ticker quote, so runs are comparable."""
+    rng = random.Random(hashlib.sha256(ticker.encode()).digest())
+    prev_close = round(rng.uniform(5, 800), 2)
+    change_pct = round(rng.uniform(-4, 4), 2)
+    change = round(prev_close * change_pct / 100, 2)
+    return {"symbol": ticker, "last": f"{prev_close + change:.2f}", "change": f"{change:+.2f}",
+            "change_pct": f"{change_pct:+.2f}%", "previous_day_closing": f"{prev_close:.2f}",
+            "volume": str(rng.randint(10_000, 50_000_000)), "last_time": "2024-01-10T16:00:00.000-0500"}
+
+
+def synthetic_page(ticker, page_kb):
+    quote = synthetic_quote(ticker)
+    change = float(quote["change"])
+    return PAGE_TEMPLATE.format(
+        ticker=ticker, state=json.dumps({"quote": {"data": [quote]}}), price=float(quote["last"]),
+        change_class="QuoteStrip-changeDown" if change < 0 else "QuoteStrip-changeUp",
+        change=change, change_pct=float(quote["change_pct"].rstrip("%")), quote_time=quote["last_time"],
+        prev_close=float(quote["previous_day_closing"]), volume=int(quote["volume"]),
+        # Real quote pages are mostly scripts and markup we never read
+        padding="x" * (page_kb * 1024))
+
+
+class FakeQuoteServer:
+    """Local HTTP server for /quotes/<ticker> plus a /webhook sink.
+
+    Each quote request waits `latency_ms` ± `jitter_ms`; `fail_rate` of them
+    get a 503 and `garble_rate` a page with no quote in it. Pages come from
+    `pages_dir/<ticker>.html` when present, else are generated.
+    """
+
+    def __init__(self, latency_ms=30, jitter_ms=10, fail_rate=0.0, garble_rate=0.0, page_kb=200, pages_dir=None,
+                 seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.fail_rate = fail_rate
+        self.garble_rate = garble_rate
+        self.page_kb = page_kb
+        self.pages_dir = pages_dir
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.quote_requests = 0
+        self.failures = 0
+        self.webhook_posts = 0
+        self.webhook_bytes = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if not self.path.startswith("/quotes/"):
+                    self.send_error(404)
+                    return
+                status, body = server.quote_response(self.path[len("/quotes/"):])
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self.rfile.read(length)
+                with server.lock:
+                    server.webhook_posts += 1
+                    server.webhook_bytes += length
+                self.send_response(204)
+                self.end_headers()
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def quote_response(self, ticker):
+        with self.lock:
+            self.quote_requests += 1
+            delay = max(0.0, self.rng.gauss(self.latency_ms, self.jitter_ms)) / 1000
+            roll = self.rng.random()
+        time.sleep(delay)
+        if roll < self.fail_rate:
+            with self.lock:
+                self.failures += 1
+            return 503, b"Service Unavailable"
+        if roll < self.fail_rate + self.garble_rate:
+            return 200, b"<html><body>Please enable JavaScript</body></html>"
+
+        recorded = os.path.join(self.pages_dir, f"{ticker}.html") if self.pages_dir else None
+        if recorded and os.path.exists(recorded):
+            with open(recorded, "rb") as f:
+                return 200, f.read()
+        return 200, synthetic_page(ticker, self.page_kb).encode()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def write_portfolio(path, size):
+    rng = random.Random(size)
+    portfolio = {f"T{i:04d}": {"shares": rng.randint(1, 200), "price": round(rng.uniform(5, 500), 2)}
+                 for i in range(size)}
+    with open(path, "w") as f:
+        json.dump(portfolio, f)
+    return list(portfolio)
+
+
+def run_once(server, size, workdir, args):
+    from portfolio_manager import PortfolioManager
+
+    portfolio_path = os.path.join(workdir, f"bench_{size}.json")
+    write_portfolio(portfolio_path, size)
+    os.environ["DISCORD_WEBHOOK_URL"] = f"{server.base}/webhook"
+    requests_before, posts_before = server.quote_requests, server.webhook_posts
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            bot = PortfolioManager(db_name=os.path.join(workdir, f"bench_{size}.db"), concurrency=args.concurrency,
+                                   min_host_interval=args.min_host_interval, quote_source=args.quote_source,
+                                   renderer=args.renderer, portfolio_files=[portfolio_path],
+                                   fetch_deadline=args.fetch_deadline, use_quote_cache=False,
+                                   run_id=f"bench-{size}-{time.time_ns()}", quote_url=f"{server.base}/quotes/{{ticker}}")
+            start = time.perf_counter()
+            bot.run()
+            wall_ms = (time.perf_counter() - start) * 1000
+    finally:
+        os.chdir(cwd)
+
+    metrics = bot.metrics.to_dict()
+    latencies = np.array([t["ms"] for t in bot.metrics.tickers.values()]) if bot.metrics.tickers else np.zeros(1)
+    return {
+        "size": size,
+        "wall_ms": wall_ms,
+        "stages": metrics["stages"],
+        "quotes_ok": sum(t["ok"] for t in bot.metrics.tickers.values()),
+        "retries": sum(max(t["attempts"] - 1, 0) for t in bot.metrics.tickers.values()),
+        "fetch_p50_ms": float(np.percentile(latencies, 50)),
+        "fetch_p95_ms": float(np.percentile(latencies, 95)),
+        "server_requests": server.quote_requests - requests_before,
+        "webhook_posts": server.webhook_posts - posts_before,
+    }
+
+
+def print_result(result):
+    size = result["size"]
+    print(f"\n📊 {size} tickers: {result['wall_ms'] / 1000:.2f}s wall, {result['quotes_ok']}/{size} quotes, "
+          f"{result['retries']} retries, {result['server_requests']} requests, "
+          f"fetch p50 {result['fetch_p50_ms']:.0f} ms / p95 {result['fetch_p95_ms']:.0f} ms")
+    print(f"   {'stage':<20}{'calls':>7}{'total ms':>12}{'tickers/s':>12}")
+    for name, stage in sorted(result["stages"].items(), key=lambda kv: -kv[1]["ms"]):
+        rate = size / (stage["ms"] / 1000) if stage["ms"] > 0 else float("inf")
+        print(f"   {name:<20}{stage['calls']:>7}{stage['ms']:>12,.1f}{rate:>12,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark full scans against a local fake quote server.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="portfolio sizes to run")
+    parser.add_argument("--latency-ms", type=float, default=30, help="mean quote page latency")
+    parser.add_argument("--jitter-ms", type=float, default=10, help="std dev of quote page latency")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of quote requests answered with 503")
+    parser.add_argument("--garble-rate", type=float, default=0.0, help="fraction answered with an unparseable page")
+    parser.add_argument("--page-kb", type=int, default=200, help="padding per synthetic page")
+    parser.add_argument("--pages-dir", help="serve recorded <TICKER>.html pages from here when present")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--min-host-interval", type=float, default=0.0,
+                        help="per-host spacing (production uses 0.25; 0 measures the pipeline itself)")
+    parser.add_argument("--quote-source", choices=["http", "browser", "http-only"], default="http-only")
+    parser.add_argument("--renderer", choices=["image", "html"], default="image")
+    parser.add_argument("--fetch-deadline", type=float, default=10.0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    results = []
+    with FakeQuoteServer(args.latency_ms, args.jitter_ms, args.fail_rate, args.garble_rate, args.page_kb,
+                         args.pages_dir) as server, tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            result = run_once(server, size, workdir, args)
+            print_result(result)
+            results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
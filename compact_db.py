@@ -0,0 +1,178 @@
+"""Shrink portfolio.db: roll old raw history into daily OHLC rows, then VACUUM.
+
+    python compact_db.py --keep-days 45
+    python compact_db.py --keep-days 45 --export history.npz
+
+Raw `portfolio_history` rows older than the window become one
+`history_daily` row per portfolio, ticker and day (first/high/low/last
+price, last shares/value/day change). Old fetch checkpoints and per-ticker
+timing rows are dropped too; scan headers, the net worth rollup and the
+analytics cache are kept, so graphs and reports don't change.
+"""
+import argparse
+import os
+import struct
+import zipfile
+from datetime import date, timedelta
+
+import numpy as np
+
+from portfolio_db import PortfolioDB
+
+ARCHIVE_FLOATS = ("open", "high", "low", "close", "shares", "value", "change_pct")
+
+
+def compact_history(db, keep_days=45):
+    """Roll raw rows from before the last `keep_days` days into `history_daily`; returns (rows, days) folded."""
+    cutoff = (date.today() - timedelta(days=keep_days)).isoformat()
+    conn = db.conn
+    with conn:
+        rows, days = conn.execute("SELECT COUNT(*), COUNT(DISTINCT date(scan_time)) FROM portfolio_history "
+                                  "WHERE scan_time < ?", (cutoff,)).fetchone()
+        if not rows:
+            return 0, 0
+        conn.execute('''
+            INSERT INTO history_daily (portfolio, day, ticker, open, high, low, close, shares, value, change_pct, samples)
+            SELECT portfolio, day, ticker,
+                   MAX(CASE WHEN first_rn = 1 THEN price END), MAX(price), MIN(price),
+                   MAX(CASE WHEN last_rn = 1 THEN price END), MAX(CASE WHEN last_rn = 1 THEN shares END),
+                   MAX(CASE WHEN last_rn = 1 THEN value END), MAX(CASE WHEN last_rn = 1 THEN change_pct END),
+                   COUNT(*)
+            FROM (
+                SELECT portfolio, date(scan_time) AS day, ticker, price, shares, value, change_pct,
+                       ROW_NUMBER() OVER (PARTITION BY portfolio, date(scan_time), ticker
+                                          ORDER BY scan_time, id) AS first_rn,
+                       ROW_NUMBER() OVER (PARTITION BY portfolio, date(scan_time), ticker
+                                          ORDER BY scan_time DESC, id DESC) AS last_rn
+                FROM portfolio_history
+                WHERE scan_time < ?
+            )
+            GROUP BY portfolio, day, ticker
+            ON CONFLICT(portfolio, day, ticker) DO UPDATE SET
+                high = MAX(high, excluded.high),
+                low = MIN(low, excluded.low),
+                close = excluded.close,
+                shares = excluded.shares,
+                value = excluded.value,
+                change_pct = excluded.change_pct,
+                samples = samples + excluded.samples
+        ''', (cutoff,))
+        conn.execute("DELETE FROM portfolio_history WHERE scan_time < ?", (cutoff,))
+        conn.execute("DELETE FROM scan_checkpoints WHERE run_key IN "
+                     "(SELECT run_key FROM scan_runs WHERE trading_day < ?)", (cutoff,))
+        conn.execute("DELETE FROM run_metrics WHERE kind = 'ticker' AND recorded_at < ?", (cutoff,))
+    return rows, days
+
+
+def vacuum(db):
+    # VACUUM can't run inside a transaction; the checkpoint folds the rewrite back out of the WAL
+    db.conn.execute("VACUUM")
+    db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def export_archive(db, path, portfolio=None):
+    """Write `history_daily` to an uncompressed .npz, one array per column; returns the row count.
+
+    Days are datetime64[D]; portfolio and ticker are integer codes into the
+    `portfolios` / `tickers` arrays. Rows are sorted by (portfolio, day, ticker).
+    """
+    query = ("SELECT portfolio, day, ticker, open, high, low, close, shares, value, change_pct, samples "
+             "FROM history_daily {where} ORDER BY portfolio, day, ticker")
+    params = ()
+    if portfolio:
+        query, params = query.format(where="WHERE portfolio = ?"), (portfolio,)
+    else:
+        query = query.format(where="")
+    rows = db.conn.execute(query, params).fetchall()
+
+    columns = list(zip(*rows)) if rows else [()] * 11
+    portfolios, portfolio_codes = np.unique(np.array(columns[0], dtype=str), return_inverse=True)
+    tickers, ticker_codes = np.unique(np.array(columns[2], dtype=str), return_inverse=True)
+    arrays = {
+        "portfolios": portfolios,
+        "tickers": tickers,
+        "portfolio": portfolio_codes.reshape(-1).astype(np.int16),
+        "ticker": ticker_codes.reshape(-1).astype(np.int32),
+        "day": np.array(columns[1], dtype="datetime64[D]"),
+        "samples": np.array(columns[10], dtype=np.int32),
+    }
+    for i, name in enumerate(ARCHIVE_FLOATS, start=3):
+        # NULLs become NaN
+        arrays[name] = np.array(columns[i], dtype=np.float64)
+    # np.savez stores members uncompressed, which is what lets load_archive map them
+    np.savez(path, **arrays)
+    return len(rows)
+
+
+def load_archive(path):
+    """Memory-map every array in an archive written by `export_archive`; returns {name: array}.
+
+    np.load can't map .npz members, but they are plain .npy files stored
+    uncompressed, so each one is mapped at its offset inside the zip.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as zf, open(path, "rb") as f:
+        for info in zf.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path}: {info.filename} is compressed and can't be memory-mapped")
+            f.seek(info.header_offset)
+            name_len, extra_len = struct.unpack("<HH", f.read(30)[26:30])
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            name = info.filename[:-len(".npy")]
+            if not shape or 0 in shape:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                                         order="F" if fortran else "C")
+    return arrays
+
+
+def daily_totals(archive, portfolio):
+    """(days, total value, day P&L) for one portfolio from a loaded archive, summed without a Python loop.
+
+    Day P&L is derived from each row's day change the same way the analytics
+    cache does it, so archived days line up with `analytics_days`.
+    """
+    matches = np.flatnonzero(archive["portfolios"] == portfolio)
+    if not len(matches):
+        return np.empty(0, dtype="datetime64[D]"), np.empty(0), np.empty(0)
+    mask = archive["portfolio"] == matches[0]
+    days, day_index = np.unique(archive["day"][mask], return_inverse=True)
+    day_index = day_index.reshape(-1)
+    value = np.nan_to_num(archive["value"][mask])
+    day_gain = np.nan_to_num(value - value / (1 + archive["change_pct"][mask] / 100.0))
+    return (days, np.bincount(day_index, weights=value, minlength=len(days)),
+            np.bincount(day_index, weights=day_gain, minlength=len(days)))
+
+
+def _size_mb(path):
+    return sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p)) / 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact old history into daily rows and shrink portfolio.db.")
+    parser.add_argument("--db", default="portfolio.db")
+    parser.add_argument("--keep-days", type=int, default=45, help="keep raw rows for this many recent days")
+    parser.add_argument("--export", help="also write the compacted history to this .npz file")
+    parser.add_argument("--portfolio", help="only export this portfolio")
+    parser.add_argument("--no-vacuum", action="store_true", help="skip the VACUUM (faster, but the file won't shrink)")
+    args = parser.parse_args()
+
+    before = _size_mb(args.db)
+    db = PortfolioDB(args.db)
+    try:
+        rows, days = compact_history(db, args.keep_days)
+        print(f"🗜️ Compacted {rows:,} history rows from {days:,} day(s) older than {args.keep_days} days.")
+        if not args.no_vacuum:
+            vacuum(db)
+        if args.export:
+            count = export_archive(db, args.export, portfolio=args.portfolio)
+            print(f"📦 Exported {count:,} daily rows to {args.export} ({os.path.getsize(args.export) / 1e6:.1f} MB).")
+    finally:
+        db.close()
+    print(f"✅ {args.db}: {before:.1f} MB -> {_size_mb(args.db):.1f} MB")
@@ -0,0 +1,152 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import time
+
+import requests
+from PIL import Image
+from requests.adapters import HTTPAdapter
+
+from fetch_scheduler import backoff_delay
+
+# Per-image upload budget; Discord's own cap is far higher, but smaller posts land faster
+DEFAULT_IMAGE_BUDGET = 512 * 1024
+
+
+def compact_image(path, budget=DEFAULT_IMAGE_BUDGET):
+    """Re-encode an image to fit `budget` bytes; returns (filename, bytes, mime type).
+
+    The reports are flat-colour charts and tables, so a 256-colour PNG is
+    usually a fraction of the original with crisp text. Failing that, lossy
+    WebP at falling quality, then downscaling, until it fits.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    with Image.open(path) as img:
+        img = img.convert("RGB")
+
+    buf = io.BytesIO()
+    img.quantize(colors=256, method=Image.Quantize.FASTOCTREE).save(buf, format="PNG", compress_level=9)
+    if buf.tell() <= budget:
+        return f"{stem}.png", buf.getvalue(), "image/png"
+
+    while True:
+        for quality in (85, 70, 55):
+            buf = io.BytesIO()
+            img.save(buf, format="WEBP", quality=quality, method=4)
+            if buf.tell() <= budget:
+                return f"{stem}.webp", buf.getvalue(), "image/webp"
+        if min(img.size) < 200:
+            # Can't shrink further without it being useless; send the smallest we have
+            return f"{stem}.webp", buf.getvalue(), "image/webp"
+        img = img.resize((img.width * 3 // 4, img.height * 3 // 4), Image.LANCZOS)
+
+
+class DiscordNotifier:
+    """Posts webhook messages in the background over one pooled session.
+
+    `submit` schedules a post and returns immediately; `drain` waits for
+    everything submitted so far. 429s are retried after Discord's
+    `retry_after`, server errors and connection failures with jittered
+    backoff, up to `max_attempts`.
+    """
+
+    def __init__(self, webhook_url, max_attempts=5, timeout=15, image_budget=DEFAULT_IMAGE_BUDGET, metrics=None):
+        self.webhook_url = webhook_url
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.image_budget = image_budget
+        self.metrics = metrics
+        self.logger = logging.getLogger()
+        self._pending = set()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def submit(self, content, image_paths=()):
+        """Schedule a message with the given images attached; returns its task (or None without a webhook)."""
+        if not self.webhook_url:
+            self.logger.warning("DISCORD_WEBHOOK_URL not set, skipping Discord post.")
+            return None
+        task = asyncio.get_running_loop().create_task(self.post(content, image_paths))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return task
+
+    async def drain(self):
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def close(self):
+        self.session.close()
+
+    async def post(self, content, image_paths=()):
+        start = time.perf_counter()
+        # Encoding is CPU work; keep it off the event loop along with the upload itself
+        files = await asyncio.to_thread(self._compact_all, image_paths)
+        ok = await asyncio.to_thread(self._post_sync, content, files)
+        if self.metrics is not None:
+            self.metrics.add("discord_upload", (time.perf_counter() - start) * 1000)
+        return ok
+
+    def _compact_all(self, image_paths):
+        files = []
+        for path in image_paths:
+            if not path or not os.path.exists(path):
+                continue
+            try:
+                files.append(compact_image(path, self.image_budget))
+            except OSError as e:
+                self.logger.warning(f"Couldn't encode {path} for Discord: {e}")
+        return files
+
+    def _post_sync(self, content, files):
+        payload = {"content": content,
+                   "attachments": [{"id": i, "filename": name} for i, (name, _, _) in enumerate(files)]}
+        for attempt in range(self.max_attempts):
+            multipart = {f"files[{i}]": (name, data, mime) for i, (name, data, mime) in enumerate(files)}
+            try:
+                resp = self.session.post(self.webhook_url, data={"payload_json": json.dumps(payload)},
+                                         files=multipart or None, timeout=self.timeout)
+            except requests.RequestException as e:
+                delay = backoff_delay(attempt, base=1.0, cap=30.0)
+                self.logger.warning(f"Discord post failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            if resp.status_code == 429:
+                delay = self._retry_after(resp)
+                self.logger.warning(f"Discord rate limited, retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            if resp.status_code >= 500:
+                delay = backoff_delay(attempt, base=1.0, cap=30.0)
+                self.logger.warning(f"Discord returned {resp.status_code}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            if resp.ok:
+                kb = sum(len(data) for _, data, _ in files) / 1024
+                print(f"✅ Discord Report Sent! ({len(files)} image(s), {kb:,.0f} KB)")
+                return True
+
+            print(f"❌ Failed to send Discord: HTTP {resp.status_code} {resp.text[:200]}")
+            return False
+
+        print(f"❌ Failed to send Discord after {self.max_attempts} attempts")
+        return False
+
+    @staticmethod
+    def _retry_after(resp):
+        try:
+            return float(resp.json()["retry_after"])
+        except (ValueError, KeyError, TypeError):
+            pass
+        for header in ("Retry-After", "X-RateLimit-Reset-After"):
+            try:
+                return float(resp.headers[header])
+            except (KeyError, ValueError):
+                continue
+        return 1.0
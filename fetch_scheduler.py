@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+
+import numpy as np
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+def backoff_delay(attempt, base=0.5, cap=4.0):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0.0, min(cap, base * (2 ** attempt)))
+
+
+class SourceStats:
+    """Rolling latency and outcome window for one quote source."""
+
+    def __init__(self, window=50):
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    def record(self, latency, ok, timed_out=False):
+        self.calls += 1
+        if ok:
+            # Only successful calls say anything about how long a good answer takes
+            self.latencies.append(latency)
+        else:
+            self.failures += 1
+            self.timeouts += timed_out
+
+    def percentile(self, q):
+        if not self.latencies:
+            return None
+        return float(np.percentile(np.fromiter(self.latencies, dtype=np.float64), q))
+
+
+class CircuitBreaker:
+    """Stops calling a source after `threshold` consecutive failures.
+
+    A failure is the source itself misbehaving (timeout, network error,
+    5xx); a page it served but that had no quote for the ticker isn't one.
+
+    After `cooldown` seconds one trial call is let through (half-open);
+    success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, threshold=5, cooldown=60.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self):
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self._trial_in_flight = False
+        if self.state == HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release(self):
+        """Give back a half-open trial that was abandoned without an outcome."""
+        self._trial_in_flight = False
+
+    def record(self, ok):
+        if ok:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+        else:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+
+class FetchScheduler:
+    """Runs quote fetches against an ordered list of sources within a fixed budget.
+
+    Each source is anything with `name`, `quote_url(ticker)` and an async
+    `fetch_quote(ticker)` that returns a Quote, returns None when it can't
+    read the ticker, or raises when the source is failing, plus an optional
+    `timeout` (seconds) used as its ceiling. Per-attempt timeouts come from
+    the source's observed p95 latency, clamped to [min_timeout, ceiling];
+    failed attempts are retried with jittered backoff, then the next source
+    is tried. No ticker takes longer than `deadline` seconds in total.
+
+    With `hedge`, a slow primary attempt (past its p90 latency) gets a
+    parallel request to the next source, and whichever answers first wins.
+    """
+
+    def __init__(self, sources, rate_limiter=None, attempts=2, deadline=30.0, min_timeout=1.0,
+                 default_timeout=10.0, hedge=False, breaker_threshold=5, breaker_cooldown=60.0):
+        self.sources = list(sources)
+        self.rate_limiter = rate_limiter
+        self.attempts = max(1, attempts)
+        self.deadline = deadline
+        self.min_timeout = min_timeout
+        self.default_timeout = default_timeout
+        self.hedge = hedge
+        self.stats = {s.name: SourceStats() for s in self.sources}
+        self.breakers = {s.name: CircuitBreaker(breaker_threshold, breaker_cooldown) for s in self.sources}
+        # For each ticker's latest fetch: attempts made (hedges included), and
+        # seconds spent in attempts vs. waiting on the host rate limiter
+        self.attempts_by_ticker = {}
+        self.latency_by_ticker = {}
+        self.wait_by_ticker = {}
+        self.logger = logging.getLogger()
+
+    def timeout_for(self, source):
+        ceiling = getattr(source, "timeout", None) or self.default_timeout
+        p95 = self.stats[source.name].percentile(95)
+        if p95 is None or len(self.stats[source.name].latencies) < 5:
+            return ceiling
+        return min(ceiling, max(self.min_timeout, p95 * 2))
+
+    def hedge_delay(self, source):
+        if len(self.stats[source.name].latencies) < 5:
+            return None
+        return self.stats[source.name].percentile(90)
+
+    async def _attempt(self, source, ticker, budget):
+        self.attempts_by_ticker[ticker] = self.attempts_by_ticker.get(ticker, 0) + 1
+        start = time.monotonic()
+        if self.rate_limiter is not None:
+            await self.rate_limiter.wait(source.quote_url(ticker))
+        self.wait_by_ticker[ticker] = self.wait_by_ticker.get(ticker, 0.0) + time.monotonic() - start
+        timeout = min(self.timeout_for(source), budget)
+        start = time.monotonic()
+        timed_out = errored = False
+        try:
+            quote = await asyncio.wait_for(source.fetch_quote(ticker), timeout)
+        except asyncio.TimeoutError:
+            quote, timed_out, errored = None, True, True
+            self.logger.warning(f"⏱️ {source.name} timed out on {ticker} after {timeout:.1f}s")
+        except asyncio.CancelledError:
+            # Lost a hedge race; says nothing about the source's health
+            self.breakers[source.name].release()
+            raise
+        except Exception as e:
+            quote, errored = None, True
+            self.logger.warning(f"{source.name} failed on {ticker}: {e}")
+        ok = quote is not None
+        self.latency_by_ticker[ticker] = self.latency_by_ticker.get(ticker, 0.0) + time.monotonic() - start
+        self.stats[source.name].record(time.monotonic() - start, ok, timed_out)
+        # A None quote means the source answered but couldn't read this ticker
+        self.breakers[source.name].record(not errored)
+        return quote
+
+    async def _hedged_attempt(self, source, backup, ticker, budget):
+        primary = asyncio.create_task(self._attempt(source, ticker, budget))
+        delay = self.hedge_delay(source)
+        if backup is None or delay is None or delay >= budget:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not self.breakers[backup.name].allow():
+            return await primary
+
+        self.logger.info(f"🪁 {source.name} slow on {ticker} (> {delay:.1f}s), hedging with {backup.name}")
+        pending = {primary, asyncio.create_task(self._attempt(backup, ticker, budget - delay))}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.result() is not None:
+                        return task.result()
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def fetch(self, ticker):
+        """Best quote for `ticker` from the first source that answers, or None."""
+        self.attempts_by_ticker[ticker] = 0
+        self.latency_by_ticker[ticker] = 0.0
+        self.wait_by_ticker[ticker] = 0.0
+        deadline = time.monotonic() + self.deadline
+        for i, source in enumerate(self.sources):
+            backup = self.sources[i + 1] if self.hedge and i + 1 < len(self.sources) else None
+            for attempt in range(self.attempts):
+                budget = deadline - time.monotonic()
+                if budget <= 0:
+                    self.logger.warning(f"❌ {ticker}: no quote within the {self.deadline:.0f}s budget")
+                    return None
+                if not self.breakers[source.name].allow():
+                    break
+                quote = await self._hedged_attempt(source, backup, ticker, budget)
+                if quote is not None:
+                    return quote
+                if attempt + 1 < self.attempts:
+                    await asyncio.sleep(min(backoff_delay(attempt), max(0.0, deadline - time.monotonic())))
+        return None
+
+    def summary(self):
+        """One line per source: calls, error rate, latency percentiles and breaker state."""
+        lines = []
+        for source in self.sources:
+            stats = self.stats[source.name]
+            if not stats.calls:
+                continue
+            p50, p95 = stats.percentile(50), stats.percentile(95)
+            latency = f"p50 {p50:.2f}s, p95 {p95:.2f}s" if p50 is not None else "no successes"
+            lines.append(f"{source.name}: {stats.calls} calls, {stats.failures} failed "
+                         f"({stats.timeouts} timeouts), {latency}, breaker {self.breakers[source.name].state}")
+        return lines
@@ -0,0 +1,89 @@
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.ticker import FuncFormatter
+from datetime import datetime
+
+from compact_db import daily_totals
+from portfolio_db import DEFAULT_PORTFOLIO
+
+
+def update_daily_rollup(db):
+    """Fold scans newer than the rollup's high-water mark into `daily_networth`.
+
+    Only the new `scans` header rows are read (their totals cover the whole
+    portfolio, even for daemon ticks that stored just the moved tickers).
+    The latest scan of a day overwrites that portfolio's total for the day,
+    unless it is missing more quotes than the scan already recorded, so a
+    failed fetch late in the day can't undercut an earlier complete total.
+    Returns the number of scans folded in.
+    """
+    conn = db.conn
+    last_scan = conn.execute("SELECT COALESCE(MAX(scan_id), 0) FROM daily_networth").fetchone()[0]
+    with conn:
+        cursor = conn.execute('''
+            INSERT INTO daily_networth (portfolio, day, scan_id, total_value, missing_count)
+            SELECT portfolio, date(started_at), id, total_equity, missing_count
+            FROM scans
+            WHERE id > ? AND ticker_count > 0
+            ORDER BY id
+            ON CONFLICT(portfolio, day) DO UPDATE SET
+                scan_id = excluded.scan_id,
+                total_value = excluded.total_value,
+                missing_count = excluded.missing_count
+            WHERE excluded.missing_count <= daily_networth.missing_count
+        ''', (last_scan,))
+    return cursor.rowcount
+
+
+def render_history_graph(db, path="history_graph.png", portfolio=DEFAULT_PORTFOLIO, max_days=None,
+                         title="Net Worth History", archive=None):
+    """Draw the net worth trend from the daily rollup (never the raw history).
+
+    `archive` is an export loaded with `compact_db.load_archive`; its days
+    before the rollup's first day are drawn too, so history pruned from the
+    database (or lost with an expired artifact) stays on the graph.
+    """
+    query = "SELECT day, total_value FROM daily_networth WHERE portfolio = ? ORDER BY day"
+    params = (portfolio,)
+    if max_days:
+        query = ("SELECT day, total_value FROM (SELECT day, total_value FROM daily_networth "
+                 "WHERE portfolio = ? ORDER BY day DESC LIMIT ?) ORDER BY day")
+        params = (portfolio, max_days)
+    points = db.conn.execute(query, params).fetchall()
+    if archive is not None and (not max_days or len(points) < max_days):
+        first = db.conn.execute("SELECT MIN(day) FROM daily_networth WHERE portfolio = ?", (portfolio,)).fetchone()[0]
+        archived_days, archived_values, _ = daily_totals(archive, portfolio)
+        if first:
+            older = archived_days < np.datetime64(first)
+            archived_days, archived_values = archived_days[older], archived_values[older]
+        older_points = [(str(day), float(value)) for day, value in zip(archived_days, archived_values)]
+        points = older_points[-(max_days - len(points)):] + points if max_days else older_points + points
+    if not points:
+        return None
+
+    days = [datetime.strptime(day, "%Y-%m-%d") for day, _ in points]
+    values = [value for _, value in points]
+
+    fig, ax = plt.subplots(figsize=(10, 5), dpi=100)
+    fig.patch.set_facecolor("#2f3136")
+    ax.set_facecolor("#000000")
+
+    ax.plot(days, values, color="#4caf50", linewidth=2, marker="o", markersize=4)
+    ax.fill_between(days, values, color="#4caf50", alpha=0.05)
+
+    ax.set_title(title, color="white", fontsize=14, pad=20)
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda v, _: f"${v:,.0f}"))
+    ax.xaxis.set_major_formatter(mdates.DateFormatter("%m/%d"))
+    ax.tick_params(colors="white")
+    plt.setp(ax.get_xticklabels(), rotation=45)
+    ax.grid(True, linestyle="--", color="#333333")
+    for spine in ax.spines.values():
+        spine.set_color("#555555")
+
+    fig.tight_layout()
+    fig.savefig(path, facecolor=fig.get_facecolor())
+    plt.close(fig)
+    return path
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+
+_NO_DATE = np.datetime64("NaT", "D")
+
+# In-process cache for long-running callers: path -> (mtime_ns, size, Holdings)
+_memory_cache = {}
+
+
+class Lot:
+    """One purchase lot. A lightweight view over a row of `Holdings`."""
+
+    __slots__ = ("ticker", "shares", "price", "acquired")
+
+    def __init__(self, ticker, shares, price, acquired=None):
+        self.ticker = ticker
+        self.shares = shares
+        self.price = price
+        self.acquired = acquired
+
+    @property
+    def cost_basis(self):
+        return self.shares * self.price
+
+    def unrealized_gain(self, price):
+        return (price - self.price) * self.shares
+
+    def __repr__(self):
+        acquired = f", acquired={self.acquired}" if self.acquired else ""
+        return f"Lot({self.ticker}, shares={self.shares}, price={self.price}{acquired})"
+
+
+class Holdings:
+    """Every lot in a portfolio file, stored column-wise in NumPy arrays.
+
+    Lots keep their file order; `acquired` is NaT for lots without a date.
+    """
+
+    def __init__(self, tickers, shares, prices, acquired=None):
+        self.tickers = np.asarray(tickers, dtype=str)
+        self.shares = np.asarray(shares, dtype=np.float64)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        if acquired is None:
+            acquired = np.full(len(self.shares), _NO_DATE)
+        self.acquired = np.asarray(acquired, dtype="datetime64[D]")
+
+    def __len__(self):
+        return len(self.shares)
+
+    @classmethod
+    def from_portfolio_json(cls, raw_data, source="portfolio.json"):
+        """Parse and validate `{ticker: lot | [lots]}`; lots take shares, price (or cost) and an optional date."""
+        tickers, shares, prices, acquired = [], [], [], []
+        for ticker, lots in raw_data.items():
+            if isinstance(lots, dict):
+                lots = [lots]
+            for i, lot in enumerate(lots):
+                where = f"{source}: {ticker} lot {i}"
+                try:
+                    s = float(lot['shares'])
+                    p = float(lot.get('price', lot.get('cost', 0)))
+                    date = lot.get('date', lot.get('acquired'))
+                    d = np.datetime64(date, "D") if date else _NO_DATE
+                except KeyError as e:
+                    raise ValueError(f"{where}: missing {e}") from None
+                except (TypeError, ValueError) as e:
+                    raise ValueError(f"{where}: {e}") from None
+                if s < 0 or p < 0:
+                    raise ValueError(f"{where}: shares and price must not be negative")
+                tickers.append(ticker)
+                shares.append(s)
+                prices.append(p)
+                acquired.append(d)
+        return cls(tickers, shares, prices, acquired)
+
+    def lot_indices(self, ticker):
+        """Row indices of a ticker's lots in FIFO order (dated lots oldest first, then undated in file order)."""
+        rows = np.flatnonzero(self.tickers == ticker)
+        order = np.argsort(self.acquired[rows], kind="stable")
+        return rows[order]
+
+    def lots(self, ticker):
+        out = []
+        for i in self.lot_indices(ticker).tolist():
+            acquired = None if np.isnat(self.acquired[i]) else self.acquired[i].item()
+            out.append(Lot(ticker, float(self.shares[i]), float(self.prices[i]), acquired))
+        return out
+
+    def lot_gains(self, prices_by_ticker):
+        """Unrealized gain of every lot at once; NaN where the ticker has no price."""
+        uniq, inverse = np.unique(self.tickers, return_inverse=True)
+        price_of = np.array([prices_by_ticker.get(t, np.nan) for t in uniq.tolist()], dtype=np.float64)
+        return (price_of[inverse.reshape(-1)] - self.prices) * self.shares
+
+    def unrealized_gain(self, ticker, price, shares=None, lots=None):
+        """Unrealized gain on part or all of a ticker's position.
+
+        By default every lot counts. `shares` picks that many shares FIFO,
+        and `lots` names specific lots by their FIFO position (as returned
+        by `lots()`), for specific-lot identification. With both, shares
+        come from the named lots oldest first, whatever order they're listed in.
+        """
+        rows = self.lot_indices(ticker)
+        if lots is not None:
+            rows = rows[np.unique(np.asarray(lots, dtype=np.int64))]
+        lot_shares = self.shares[rows]
+
+        if shares is not None:
+            if shares > lot_shares.sum():
+                raise ValueError(f"{ticker}: only {lot_shares.sum():g} shares held, asked for {shares:g}")
+            # Shares consumed from each lot, oldest first
+            before = np.cumsum(lot_shares) - lot_shares
+            lot_shares = np.clip(shares - before, 0.0, lot_shares)
+
+        return float(np.sum((price - self.prices[rows]) * lot_shares))
+
+
+def _cache_path(path):
+    head, tail = os.path.split(path)
+    return os.path.join(head, f".{tail}.cache.npz")
+
+
+def _save_cache(cache_path, holdings, mtime_ns, size, digest):
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, tickers=holdings.tickers, shares=holdings.shares, prices=holdings.prices,
+                 acquired=holdings.acquired, stat=np.array([mtime_ns, size], dtype=np.int64),
+                 digest=np.array(digest))
+    os.replace(tmp_path, cache_path)
+
+
+def load_holdings(path="portfolio.json", use_cache=True):
+    """Load a portfolio file, skipping JSON parsing when it hasn't changed.
+
+    An unchanged mtime and size hits the cache straight away. Otherwise the
+    file's SHA-256 is compared with the cached one, so a touched but
+    unmodified file still skips the parse. The parsed lots live in a
+    `.<name>.cache.npz` sidecar next to the file.
+    """
+    logger = logging.getLogger()
+    st = os.stat(path)
+
+    cached = _memory_cache.get(path)
+    if use_cache and cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
+
+    cache_path = _cache_path(path)
+    cache = None
+    if use_cache and os.path.exists(cache_path):
+        try:
+            with np.load(cache_path, allow_pickle=False) as npz:
+                cache = {name: npz[name] for name in npz.files}
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable holdings cache {cache_path}: {e}")
+
+    holdings = None
+    if cache is not None and tuple(cache["stat"].tolist()) == (st.st_mtime_ns, st.st_size):
+        holdings = Holdings(cache["tickers"], cache["shares"], cache["prices"], cache["acquired"])
+    else:
+        with open(path, "rb") as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        if cache is not None and str(cache["digest"]) == digest:
+            holdings = Holdings(cache["tickers"], cache["shares"], cache["prices"], cache["acquired"])
+        else:
+            holdings = Holdings.from_portfolio_json(json.loads(content), source=path)
+        if use_cache:
+            try:
+                _save_cache(cache_path, holdings, st.st_mtime_ns, st.st_size, digest)
+            except OSError as e:
+                logger.warning(f"Couldn't write holdings cache {cache_path}: {e}")
+
+    if use_cache:
+        _memory_cache[path] = (st.st_mtime_ns, st.st_size, holdings)
+    return holdings
@@ -0,0 +1,120 @@
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+EASTERN = ZoneInfo("America/New_York")
+
+PRE_MARKET = "pre"
+OPEN = "open"
+POST_MARKET = "post"
+CLOSED = "closed"
+HOLIDAY = "holiday"
+
+PRE_OPEN_TIME = time(4, 0)
+OPEN_TIME = time(9, 30)
+CLOSE_TIME = time(16, 0)
+POST_CLOSE_TIME = time(20, 0)
+
+
+def _easter(year):
+    # Anonymous Gregorian algorithm
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year, month, weekday, n):
+    first = date(year, month, 1)
+    return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+
+def _last_weekday(year, month, weekday):
+    last = (date(year, month + 1, 1) if month < 12 else date(year + 1, 1, 1)) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(d):
+    # Saturday holidays close the Friday before, Sunday ones the Monday after
+    if d.weekday() == 5:
+        return d - timedelta(days=1)
+    if d.weekday() == 6:
+        return d + timedelta(days=1)
+    return d
+
+
+@lru_cache(maxsize=None)
+def nyse_holidays(year):
+    """Full-day NYSE closures for a year."""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),            # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),            # Washington's Birthday
+        _easter(year) - timedelta(days=2),      # Good Friday
+        _last_weekday(year, 5, 0),              # Memorial Day
+        _observed(date(year, 7, 4)),            # Independence Day
+        _nth_weekday(year, 9, 0, 1),            # Labor Day
+        _nth_weekday(year, 11, 3, 4),           # Thanksgiving
+        _observed(date(year, 12, 25)),          # Christmas
+    }
+    # New Year's Day on a Saturday is not made up on the Friday before
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(holidays)
+
+
+def is_trading_day(d):
+    return d.weekday() < 5 and d not in nyse_holidays(d.year)
+
+
+def to_eastern(now=None):
+    if now is None:
+        return datetime.now(EASTERN)
+    return now.astimezone(EASTERN)
+
+
+def market_session(now=None):
+    """Which US equity session `now` falls in: pre, open, post, closed or holiday."""
+    now = to_eastern(now)
+    today = now.date()
+    if today.weekday() >= 5:
+        return CLOSED
+    if today in nyse_holidays(today.year):
+        return HOLIDAY
+
+    t = now.time()
+    if OPEN_TIME <= t < CLOSE_TIME:
+        return OPEN
+    if PRE_OPEN_TIME <= t < OPEN_TIME:
+        return PRE_MARKET
+    if CLOSE_TIME <= t < POST_CLOSE_TIME:
+        return POST_MARKET
+    return CLOSED
+
+
+def last_close(now=None):
+    """The most recent regular-session close at or before `now`, in Eastern time."""
+    now = to_eastern(now)
+    day = now.date()
+    if now.time() < CLOSE_TIME:
+        day -= timedelta(days=1)
+    while not is_trading_day(day):
+        day -= timedelta(days=1)
+    return datetime.combine(day, CLOSE_TIME, tzinfo=EASTERN)
+
+
+def trading_day(now=None):
+    """The session a quote taken at `now` belongs to: today once the bell rings, else the last close."""
+    now = to_eastern(now)
+    if is_trading_day(now.date()) and now.time() >= OPEN_TIME:
+        return now.date()
+    return last_close(now).date()
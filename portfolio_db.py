@@ -0,0 +1,454 @@
+import sqlite3
+import time
+from datetime import datetime
+
+from quotes import Quote
+
+# Name recorded for rows from the original single portfolio.json
+DEFAULT_PORTFOLIO = 'portfolio'
+
+
+def parse_pct(text):
+    """'-1.23%' / '+0.45%' / 'UNCH' -> -1.23 / 0.45 / 0.0 (percent units)."""
+    if text is None:
+        return None
+    clean = str(text).replace('%', '').replace('+', '').replace(',', '').strip()
+    if not clean or "UNCH" in clean.upper():
+        return 0.0
+    return float(clean)
+
+
+def _table_columns(conn, table):
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _migrate_v1(conn):
+    """Typed, indexed history with a scans table.
+
+    Upgrades in place from either legacy layout: setup_db/portfolio_bot's
+    `news_headline` table, or PortfolioManager's `change_pct TEXT` table
+    (with or without a scan_id column).
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS scans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            ticker_count INTEGER,
+            total_equity REAL,
+            total_pl REAL,
+            day_pl REAL,
+            day_pct REAL
+        )
+    ''')
+
+    legacy_columns = _table_columns(conn, 'portfolio_history')
+    if legacy_columns:
+        conn.execute("ALTER TABLE portfolio_history RENAME TO portfolio_history_legacy")
+
+    conn.execute('''
+        CREATE TABLE portfolio_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scan_id INTEGER REFERENCES scans(id),
+            scan_time TIMESTAMP NOT NULL,
+            ticker TEXT NOT NULL,
+            price REAL,
+            shares REAL,
+            value REAL,
+            change_pct REAL,
+            news_headline TEXT
+        )
+    ''')
+
+    if legacy_columns:
+        scan_id = "scan_id" if "scan_id" in legacy_columns else "NULL"
+        headline = "news_headline" if "news_headline" in legacy_columns else "NULL"
+        if "change_pct" in legacy_columns:
+            # Same cleanup as parse_pct: "-1.23%" -> -1.23, "1,234.5%" -> 1234.5;
+            # 'UNCH' and other non-numeric text cast to 0.0
+            change_pct = ("CASE WHEN change_pct IS NULL THEN NULL ELSE "
+                          "CAST(TRIM(REPLACE(REPLACE(REPLACE(change_pct, '%', ''), '+', ''), ',', '')) AS REAL) END")
+        else:
+            change_pct = "NULL"
+        conn.execute(f'''
+            INSERT INTO portfolio_history (id, scan_id, scan_time, ticker, price, shares, value, change_pct, news_headline)
+            SELECT id, {scan_id}, scan_time, ticker, price, shares, value, {change_pct}, {headline}
+            FROM portfolio_history_legacy
+            WHERE scan_time IS NOT NULL AND ticker IS NOT NULL
+        ''')
+        conn.execute("DROP TABLE portfolio_history_legacy")
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_history_ticker_time ON portfolio_history (ticker, scan_time)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_history_scan_time ON portfolio_history (scan_time)")
+
+
+def _migrate_v2(conn):
+    """Materialized daily net worth for the history graph (see history_graph.py)."""
+    conn.execute('''
+        CREATE TABLE daily_networth (
+            day TEXT PRIMARY KEY,
+            scan_id INTEGER,
+            total_value REAL NOT NULL
+        )
+    ''')
+    # Backfill from existing history using each ticker's last value of the
+    # day, since legacy rows have no scan_id to group them into scans.
+    conn.execute('''
+        INSERT INTO daily_networth (day, scan_id, total_value)
+        SELECT day, MAX(scan_id), SUM(value) FROM (
+            SELECT date(scan_time) AS day, scan_id, value,
+                   ROW_NUMBER() OVER (PARTITION BY date(scan_time), ticker
+                                      ORDER BY scan_time DESC, id DESC) AS rn
+            FROM portfolio_history
+        )
+        WHERE rn = 1
+        GROUP BY day
+    ''')
+
+
+def _migrate_v3(conn):
+    """Several portfolio files per run: scans, history and the rollup carry a portfolio name."""
+    conn.execute(f"ALTER TABLE scans ADD COLUMN portfolio TEXT NOT NULL DEFAULT '{DEFAULT_PORTFOLIO}'")
+    conn.execute(f"ALTER TABLE portfolio_history ADD COLUMN portfolio TEXT NOT NULL DEFAULT '{DEFAULT_PORTFOLIO}'")
+
+    conn.execute("ALTER TABLE daily_networth RENAME TO daily_networth_v2")
+    conn.execute('''
+        CREATE TABLE daily_networth (
+            portfolio TEXT NOT NULL,
+            day TEXT NOT NULL,
+            scan_id INTEGER,
+            total_value REAL NOT NULL,
+            PRIMARY KEY (portfolio, day)
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO daily_networth (portfolio, day, scan_id, total_value)
+        SELECT ?, day, scan_id, total_value FROM daily_networth_v2
+    ''', (DEFAULT_PORTFOLIO,))
+    conn.execute("DROP TABLE daily_networth_v2")
+
+
+def _migrate_v4(conn):
+    """Daemon ticks: a 'tick' scan stores only the tickers that moved, but its header keeps full totals."""
+    conn.execute("ALTER TABLE scans ADD COLUMN scan_type TEXT NOT NULL DEFAULT 'full'")
+
+
+def _migrate_v5(conn):
+    """Last good quote per ticker, served while still fresh for the market session (see quote_cache.py)."""
+    conn.execute('''
+        CREATE TABLE quote_cache (
+            ticker TEXT PRIMARY KEY,
+            price REAL NOT NULL,
+            change REAL,
+            change_pct REAL NOT NULL,
+            prev_close REAL,
+            volume REAL,
+            quote_time TEXT,
+            source TEXT,
+            fetched_at REAL NOT NULL
+        )
+    ''')
+
+
+def _migrate_v6(conn):
+    """Resumable runs: a run key per trading day and run id, per-ticker checkpoints, one row per (scan, ticker)."""
+    conn.execute('''
+        CREATE TABLE scan_runs (
+            run_key TEXT PRIMARY KEY,
+            trading_day TEXT NOT NULL,
+            run_id TEXT NOT NULL,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            ticker_count INTEGER,
+            fetched_count INTEGER,
+            status TEXT NOT NULL DEFAULT 'running'
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE scan_checkpoints (
+            run_key TEXT NOT NULL REFERENCES scan_runs(run_key),
+            ticker TEXT NOT NULL,
+            status TEXT NOT NULL,
+            price REAL,
+            change REAL,
+            change_pct REAL,
+            prev_close REAL,
+            volume REAL,
+            quote_time TEXT,
+            source TEXT,
+            fetched_at REAL,
+            PRIMARY KEY (run_key, ticker)
+        )
+    ''')
+    conn.execute("ALTER TABLE scans ADD COLUMN run_key TEXT")
+    # Daemon ticks have no run key and may repeat; keyed scans are one per portfolio
+    conn.execute("CREATE UNIQUE INDEX idx_scans_run ON scans (run_key, portfolio) WHERE run_key IS NOT NULL")
+    conn.execute("CREATE UNIQUE INDEX idx_history_scan_ticker ON portfolio_history (scan_id, ticker)")
+
+
+def _migrate_v7(conn):
+    """Per-run timings: one row per stage and per fetched ticker (see run_metrics.py)."""
+    conn.execute('''
+        CREATE TABLE run_metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_key TEXT,
+            recorded_at TIMESTAMP NOT NULL,
+            kind TEXT NOT NULL,
+            name TEXT NOT NULL,
+            ms REAL,
+            count INTEGER,
+            bytes INTEGER,
+            source TEXT,
+            ok INTEGER
+        )
+    ''')
+    conn.execute("CREATE INDEX idx_run_metrics_run ON run_metrics (run_key, kind)")
+    conn.execute("CREATE INDEX idx_run_metrics_name ON run_metrics (kind, name, recorded_at)")
+
+
+def _migrate_v8(conn):
+    """Per-day analytics cache, rebuilt only for days touched by new scans (see analytics.py)."""
+    conn.execute('''
+        CREATE TABLE analytics_positions (
+            portfolio TEXT NOT NULL,
+            day TEXT NOT NULL,
+            ticker TEXT NOT NULL,
+            value REAL NOT NULL,
+            day_gain REAL NOT NULL,
+            PRIMARY KEY (portfolio, day, ticker)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE analytics_days (
+            portfolio TEXT NOT NULL,
+            day TEXT NOT NULL,
+            equity REAL NOT NULL,
+            day_pl REAL NOT NULL,
+            PRIMARY KEY (portfolio, day)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE analytics_state (
+            portfolio TEXT PRIMARY KEY,
+            last_scan_id INTEGER NOT NULL,
+            last_finished_at TIMESTAMP NOT NULL
+        )
+    ''')
+
+
+def _migrate_v9(conn):
+    """Compacted history: one open/high/low/close row per ticker and day (see compact_db.py)."""
+    conn.execute('''
+        CREATE TABLE history_daily (
+            portfolio TEXT NOT NULL,
+            day TEXT NOT NULL,
+            ticker TEXT NOT NULL,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            shares REAL,
+            value REAL,
+            change_pct REAL,
+            samples INTEGER NOT NULL,
+            PRIMARY KEY (portfolio, day, ticker)
+        )
+    ''')
+
+
+def _migrate_v10(conn):
+    """Which price alerts are currently firing, so they're posted once rather than every scan (see alerts.py)."""
+    conn.execute('''
+        CREATE TABLE alert_state (
+            rule_id TEXT NOT NULL,
+            ticker TEXT NOT NULL,
+            portfolio TEXT NOT NULL DEFAULT '',
+            active INTEGER NOT NULL,
+            fired_at TIMESTAMP,
+            value REAL,
+            PRIMARY KEY (rule_id, ticker, portfolio)
+        )
+    ''')
+
+
+def _migrate_v11(conn):
+    """Quotes missing from each scan, so a partial scan can't replace a day's complete net worth."""
+    conn.execute("ALTER TABLE scans ADD COLUMN missing_count INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE daily_networth ADD COLUMN missing_count INTEGER NOT NULL DEFAULT 0")
+    # Repair days an empty (every quote failed) scan zeroed out: fall back to that
+    # day's last scan that had rows, or drop the day if there was none
+    empty = "SELECT id FROM scans WHERE ticker_count = 0"
+    latest = '''
+        SELECT {columns} FROM scans s
+        WHERE s.portfolio = daily_networth.portfolio AND date(s.started_at) = daily_networth.day
+          AND s.ticker_count > 0
+        ORDER BY s.id DESC LIMIT 1
+    '''
+    conn.execute(f"DELETE FROM daily_networth WHERE scan_id IN ({empty}) AND NOT EXISTS ({latest.format(columns='1')})")
+    conn.execute(f"UPDATE daily_networth SET (scan_id, total_value) = ({latest.format(columns='s.id, s.total_equity')}) "
+                 f"WHERE scan_id IN ({empty})")
+    conn.execute("DELETE FROM scans WHERE ticker_count = 0")
+
+
+# Each entry upgrades the schema by one version; PRAGMA user_version records
+# how far a database has been migrated.
+MIGRATIONS = [
+    _migrate_v1,
+    _migrate_v2,
+    _migrate_v3,
+    _migrate_v4,
+    _migrate_v5,
+    _migrate_v6,
+    _migrate_v7,
+    _migrate_v8,
+    _migrate_v9,
+    _migrate_v10,
+    _migrate_v11,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+class PortfolioDB:
+    """One long-lived SQLite connection for the bot's history.
+
+    Every scan is written as a single transaction: a `scans` header row
+    plus all of its `portfolio_history` rows. A crash mid-scan leaves
+    nothing behind, and readers only ever see complete snapshots.
+    """
+
+    def __init__(self, db_name='portfolio.db'):
+        self.db_name = db_name
+        self.conn = sqlite3.connect(db_name)
+        # WAL lets readers (view_db.py, graphs) run while a scan is being written
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+
+    @property
+    def schema_version(self):
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def _migrate(self):
+        for version in range(self.schema_version + 1, SCHEMA_VERSION + 1):
+            # Explicit BEGIN so DDL and data copies land atomically
+            self.conn.execute("BEGIN")
+            try:
+                MIGRATIONS[version - 1](self.conn)
+                self.conn.execute(f"PRAGMA user_version = {version}")
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def write_scan(self, started_at, rows, total_equity, total_pl, day_pl, day_pct, finished_at=None,
+                   portfolio=DEFAULT_PORTFOLIO, scan_type='full', run_key=None, missing_count=0):
+        """Persist one portfolio's scan atomically and return its id.
+
+        `rows` are the report rows built in `PortfolioManager.run`
+        (ticker, price, shares, value, pct_change). For `scan_type='tick'`
+        they are only the positions that changed; the totals always cover
+        the whole portfolio. `missing_count` is how many of the portfolio's
+        tickers had no quote (and so are left out of the totals).
+
+        A scan with a `run_key` is written at most once per portfolio:
+        writing it again (a resumed or retried run) updates the same scan
+        and upserts its rows on (scan, ticker) instead of adding new ones.
+
+        Raises ValueError for a scan without rows: with every quote missing
+        its totals are zero, and a zero header would read as a real balance.
+        `PortfolioManager.save_scan` skips those itself; this is the guard.
+        """
+        if not rows:
+            raise ValueError(f"refusing to write an empty {scan_type} scan for {portfolio}")
+        finished_at = (finished_at or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+        scan_time = started_at.strftime("%Y-%m-%d %H:%M:%S")
+        header = (len(rows), missing_count, total_equity, total_pl, day_pl, day_pct)
+
+        with self.conn:
+            existing = None
+            if run_key is not None:
+                existing = self.conn.execute("SELECT id, started_at FROM scans WHERE run_key = ? AND portfolio = ?",
+                                             (run_key, portfolio)).fetchone()
+            if existing is None:
+                cursor = self.conn.execute('''
+                    INSERT INTO scans (portfolio, scan_type, run_key, started_at, finished_at, ticker_count,
+                                       missing_count, total_equity, total_pl, day_pl, day_pct)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (portfolio, scan_type, run_key, scan_time, finished_at) + header)
+                scan_id = cursor.lastrowid
+            else:
+                # Keep the original start time so the scan stays on the day it began
+                scan_id, scan_time = existing
+                self.conn.execute('''
+                    UPDATE scans SET finished_at = ?, ticker_count = ?, missing_count = ?, total_equity = ?,
+                                     total_pl = ?, day_pl = ?, day_pct = ?
+                    WHERE id = ?
+                ''', (finished_at,) + header + (scan_id,))
+                self.conn.execute(f'''
+                    DELETE FROM portfolio_history
+                    WHERE scan_id = ? AND ticker NOT IN ({",".join("?" * len(rows))})
+                ''', [scan_id] + [r['ticker'] for r in rows])
+                # The rollup only folds in new scan ids, so refresh a day this scan already fed
+                self.conn.execute("UPDATE daily_networth SET total_value = ?, missing_count = ? WHERE scan_id = ?",
+                                  (total_equity, missing_count, scan_id))
+
+            self.conn.executemany('''
+                INSERT INTO portfolio_history (scan_id, portfolio, scan_time, ticker, price, shares, value, change_pct)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(scan_id, ticker) DO UPDATE SET
+                    price = excluded.price, shares = excluded.shares, value = excluded.value,
+                    change_pct = excluded.change_pct
+            ''', [(scan_id, portfolio, scan_time, r['ticker'], r['price'], r['shares'], r['value'], parse_pct(r['pct_change']))
+                  for r in rows])
+        return scan_id
+
+    def begin_run(self, run_key, trading_day, run_id, ticker_count):
+        """Register a run, or reopen it when a rerun picks it up again."""
+        with self.conn:
+            self.conn.execute('''
+                INSERT INTO scan_runs (run_key, trading_day, run_id, started_at, ticker_count)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(run_key) DO UPDATE SET ticker_count = excluded.ticker_count, status = 'running'
+            ''', (run_key, trading_day, run_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ticker_count))
+
+    def load_checkpoints(self, run_key):
+        """{ticker: Quote} for every ticker this run already fetched successfully."""
+        rows = self.conn.execute('''
+            SELECT ticker, price, change, change_pct, prev_close, volume, quote_time, source, fetched_at
+            FROM scan_checkpoints WHERE run_key = ? AND status = 'ok'
+        ''', (run_key,))
+        return {row[0]: Quote(row[0], row[1], change=row[2], change_pct=row[3], prev_close=row[4],
+                              volume=row[5], quote_time=row[6], source=row[7], fetched_at=row[8])
+                for row in rows}
+
+    def checkpoint(self, run_key, ticker, quote):
+        """Record one ticker's outcome as soon as it's known; a None or stale quote is retried on resume."""
+        if quote is None or quote.stale:
+            values = (run_key, ticker, 'failed') + (None,) * 7 + (time.time(),)
+        else:
+            values = (run_key, ticker, 'ok', quote.price, quote.change, quote.change_pct, quote.prev_close,
+                      quote.volume, quote.quote_time, quote.source, quote.fetched_at)
+        with self.conn:
+            self.conn.execute('''
+                INSERT OR REPLACE INTO scan_checkpoints (run_key, ticker, status, price, change, change_pct,
+                                                         prev_close, volume, quote_time, source, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', values)
+
+    def finish_run(self, run_key):
+        """Close out a run as 'complete' or, if any ticker is still missing, 'partial'."""
+        with self.conn:
+            fetched = self.conn.execute("SELECT COUNT(*) FROM scan_checkpoints WHERE run_key = ? AND status = 'ok'",
+                                        (run_key,)).fetchone()[0]
+            self.conn.execute('''
+                UPDATE scan_runs SET finished_at = ?, fetched_count = ?,
+                       status = CASE WHEN ? >= ticker_count THEN 'complete' ELSE 'partial' END
+                WHERE run_key = ?
+            ''', (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), fetched, fetched, run_key))
+            return self.conn.execute("SELECT status FROM scan_runs WHERE run_key = ?", (run_key,)).fetchone()[0]
+
+    def close(self):
+        # Fold the WAL back into the main file so portfolio.db is self-contained
+        # when CI uploads it as an artifact
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.conn.close()
@@ -1,146 +1,175 @@
-import json 
+import argparse
+import asyncio
 import os
-import requests
-import time
-import sqlite3
 import logging
+import numpy as np
 from datetime import datetime
-from playwright.sync_api import sync_playwright
+
+import analytics
+import market_calendar
+from alerts import AlertEngine, load_rules
+from holdings import Holdings, load_holdings
+from discord_notifier import DiscordNotifier
+from compact_db import load_archive
+from history_graph import render_history_graph, update_daily_rollup
+from portfolio_db import DEFAULT_PORTFOLIO, PortfolioDB
+from positions import PositionsEngine
+from quote_cache import QuoteCache
+from quote_providers import CNBC_QUOTE_URL, HttpQuoteProvider
+from report_renderer import render_report_image
+from run_metrics import RunMetrics, timed
+from scan_engine import DEFAULT_ALLOW_DOMAINS, DEFAULT_DENY_DOMAINS, AsyncScanEngine, RequestFilter
 
 class PortfolioManager:
-    def __init__(self, db_name='portfolio.db', headless=True):
+    def __init__(self, db_name='portfolio.db', headless=True, concurrency=4, min_host_interval=0.25,
+                 quote_source='http', renderer='image', portfolio_files=('portfolio.json',),
+                 allow_domains=(), deny_domains=(), fetch_deadline=30.0, hedge=False, use_quote_cache=True,
+                 run_id=None, metrics_json=None, quote_url=CNBC_QUOTE_URL, alerts_file='alerts.json',
+                 archive_file=None):
         self.db_name = db_name
         self.headless = headless
+        # Max quote pages in flight, and min seconds between hits on the same host
+        self.concurrency = concurrency
+        self.min_host_interval = min_host_interval
+        # 'http' reads quote pages without a browser and only falls back to
+        # Chromium for tickers it can't parse; 'browser' always uses Chromium;
+        # 'http-only' never starts Chromium for quotes
+        self.quote_source = quote_source
+        # Quote page URL template, for every source (benchmark.py points it at a local server)
+        self.quote_url = quote_url
+        # 'image' draws the report with Pillow; 'html' screenshots the HTML
+        # template in Chromium (kept for fidelity checks)
+        self.renderer = renderer
+        # Hard cap in seconds on one ticker's fetch across every source and retry;
+        # `hedge` races a second source when the first is slower than usual
+        self.fetch_deadline = fetch_deadline
+        self.hedge = hedge
+        # Serve quotes from the DB while they're still fresh for the market session
+        self.use_quote_cache = use_quote_cache
+        self.stale_tickers = set()
+        # A run is identified by trading day + run id; rerunning the same id
+        # (e.g. a CI retry) resumes it instead of starting over. Without one,
+        # every invocation is its own run, so a later manual scan fetches fresh quotes
+        self.run_id = run_id or f"local-{datetime.now():%H%M%S}-{os.getpid()}"
+        # Stage timings for the current run; optionally also written to this JSON file
+        self.metrics = RunMetrics()
+        self.metrics_json = metrics_json
+        # Quote pages in Chromium only load first-party, non-media requests;
+        # these extend the built-in allow/deny lists
+        self.request_filter = RequestFilter(allow_domains=DEFAULT_ALLOW_DOMAINS + tuple(allow_domains),
+                                            deny_domains=DEFAULT_DENY_DOMAINS + tuple(deny_domains))
         
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
         self.logger = logging.getLogger()
 
-        self.portfolio_data = {}
-        
-        try:
-            with open('portfolio.json', 'r') as f:
-                raw_data = json.load(f)
-            
-            for ticker, lots in raw_data.items():
-                if isinstance(lots, dict): 
-                    lots = [lots]
-                
-                total_shares = 0
-                total_invested = 0.0
-                
-                for lot in lots:
-                    s = float(lot['shares'])
-                    p = float(lot.get('price', lot.get('cost', 0)))
-                    
-                    total_shares += s
-                    total_invested += (s * p)
-                
-                if total_shares > 0:
-                    avg_cost = total_invested / total_shares
-                else:
-                    avg_cost = 0
-                    
-                self.portfolio_data[ticker] = {
-                    "shares": total_shares,
-                    "cost": avg_cost
-                }
-                
-            self.logger.info("✅ Loaded portfolio data.")
-            
-        except FileNotFoundError:
-            self.logger.error("❌ portfolio.json not found!")
-            self.portfolio_data = {}
-        
-        self.tickers = list(self.portfolio_data.keys())
+        # One Holdings per portfolio file, named after the file (portfolio.json -> 'portfolio')
+        self.portfolio_files = list(portfolio_files)
+        self.portfolio_names = []
+        holdings = []
+        for path in portfolio_files:
+            name = os.path.splitext(os.path.basename(path))[0]
+            try:
+                # Parsed lots are cached next to the file and reused until it changes
+                lots = load_holdings(path)
+                self.logger.info(f"✅ Loaded {name} ({len(lots)} lots).")
+            except FileNotFoundError:
+                self.logger.error(f"❌ {path} not found!")
+                lots = Holdings([], [], [])
+            self.portfolio_names.append(name)
+            holdings.append(lots)
+
+        # Lots are collapsed into per-portfolio shares/avg cost inside the engine;
+        # its symbol list is deduplicated across portfolios, so each ticker is fetched once
+        self.holdings = holdings
+        self.positions = PositionsEngine.from_holdings(holdings, self.portfolio_names)
+        self.tickers = self.positions.tickers
         
         # Database Setup
-        with sqlite3.connect(self.db_name) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS portfolio_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    scan_time TIMESTAMP,
-                    ticker TEXT,
-                    price REAL,
-                    shares REAL,
-                    value REAL,
-                    change_pct TEXT
-                )
-            ''')
-            conn.commit()
+        self.db = PortfolioDB(self.db_name)
+        self.quote_cache = QuoteCache(self.db)
+        self.notifier = DiscordNotifier(os.getenv('DISCORD_WEBHOOK_URL'), metrics=self.metrics)
         self.logger.info("✅ Database initialized successfully.")
 
-    def _get_price_cnbc(self, page, ticker):
-        url = f"https://www.cnbc.com/quotes/{ticker}"
-        for attempt in range(3):
+        # Price alerts are optional: no rules file, no alerts
+        self.alerts = None
+        if alerts_file and os.path.exists(alerts_file):
             try:
-                page.goto(url)
-                page.wait_for_selector(".QuoteStrip-lastPrice", timeout=5000)
-                val = page.locator(".QuoteStrip-lastPrice").first.inner_text()
-                return val.replace(',', '')
-            except Exception:
-                time.sleep(2)
-        return None
+                self.alerts = AlertEngine(self.db, load_rules(alerts_file), self.notifier)
+                self.logger.info(f"🚨 Loaded {len(self.alerts)} alert rule(s) from {alerts_file}.")
+            except ValueError as e:
+                self.logger.error(f"❌ Alerts disabled: {e}")
 
-    def _get_change_cnbc(self, page):
+        # Daily history exported by `compact_db.py --export`, memory-mapped and
+        # used by the graph and analytics for days the database no longer has
+        self.archive = None
+        if archive_file:
+            try:
+                self.archive = load_archive(archive_file)
+            except (OSError, ValueError, KeyError) as e:
+                self.logger.warning(f"⚠️ Ignoring history archive {archive_file}: {e}")
+
+    @timed("db_write")
+    def save_scan(self, started_at, portfolio_rows, total_equity, total_pl, day_pl, total_day_pct,
+                  portfolio=DEFAULT_PORTFOLIO, scan_type='full', run_key=None, missing_count=0):
+        if not portfolio_rows:
+            # Every quote failed: expected on a bad day, and a zero-equity scan would read as a real balance
+            self.logger.warning(f"⚠️ No quotes for {portfolio}, skipping the {scan_type} scan save.")
+            return None
         try:
-            # 1. Check if the stock is DOWN (CNBC uses the 'changeDown' class for red)
-            if page.locator(".QuoteStrip-changeDown").count() > 0:
-                full_text = page.locator(".QuoteStrip-changeDown").first.inner_text()
-                # Extract the percentage from the parentheses
-                val = full_text.split("(")[1].replace(")", "") if "(" in full_text else full_text
-                # Strip any existing signs and FORCE a negative sign
-                val = val.replace("-", "").replace("+", "").strip()
-                return f"-{val}"
-            
-            # 2. Check if the stock is UP (CNBC uses 'changeUp' for green)
-            elif page.locator(".QuoteStrip-changeUp").count() > 0:
-                full_text = page.locator(".QuoteStrip-changeUp").first.inner_text()
-                val = full_text.split("(")[1].replace(")", "") if "(" in full_text else full_text
-                # Strip signs to ensure it's a clean positive string
-                val = val.replace("-", "").replace("+", "").strip()
-                return val
-                
-            # 3. If it's unchanged or fails to find the classes
-            return "0.00%"
-            
+            scan_id = self.db.write_scan(started_at, portfolio_rows, total_equity, total_pl, day_pl, total_day_pct,
+                                         portfolio=portfolio, scan_type=scan_type, run_key=run_key,
+                                         missing_count=missing_count)
+            self.logger.info(f"💾 Saved {portfolio} scan #{scan_id} ({len(portfolio_rows)} positions).")
+            return scan_id
         except Exception as e:
-            self.logger.warning(f"Failed to parse change percentage: {e}")
-            return "0.00%"
+            self.logger.error(f"Database Error: {e}")
+            return None
 
-    def save_to_db(self, ticker, price, shares, value, change_pct):
+    @timed("history_graph")
+    def update_history_graph(self, graph_path="history_graph.png", portfolio=DEFAULT_PORTFOLIO):
         try:
-            conn = sqlite3.connect(self.db_name)
-            cursor = conn.cursor()
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            cursor.execute('''
-                INSERT INTO portfolio_history (scan_time, ticker, price, shares, value, change_pct)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (timestamp, ticker, price, shares, value, change_pct))
-            conn.commit()
-            conn.close()
+            update_daily_rollup(self.db)
+            path = render_history_graph(self.db, graph_path, portfolio=portfolio,
+                                        title=self._title("Net Worth History", portfolio), archive=self.archive)
+            if path:
+                print("📈 History Graph Updated!")
+            return path
         except Exception as e:
-            self.logger.error(f"Database Error: {e}")
+            self.logger.error(f"History Graph Error: {e}")
+            return None
+
+    @timed("analytics")
+    def performance_line(self, portfolio=DEFAULT_PORTFOLIO):
+        """TWR / drawdown / volatility / top contributors for the report, or None without enough history."""
+        try:
+            stats = analytics.performance_stats(self.db, portfolio, archive=self.archive)
+            return stats.summary_line() if stats else None
+        except Exception as e:
+            self.logger.error(f"Analytics Error: {e}")
+            return None
 
-    def send_discord_report(self, total_equity, total_pl, day_pl, total_day_pct, report_path):
+    def send_discord_report(self, total_equity, total_pl, day_pl, total_day_pct, report_path, title="Daily Portfolio Scan",
+                            missing=(), stale=(), graph_path=None, stats_line=None):
+        """Queue the report (and history graph) as one Discord message; the upload runs in the background."""
         emoji = "🟢" if day_pl >= 0 else "🔴"
-        main_content = (f"**💰 Daily Portfolio Scan**\n"
+        main_content = (f"**💰 {title}**\n"
                         f"Total Equity: **${total_equity:,.2f}**\n"
                         f"Day Change: {emoji} **${day_pl:+,.2f}** (`{total_day_pct:+.2f}%`)")
-        
-        webhook_url = os.getenv('DISCORD_WEBHOOK_URL')
-        
-        try:
-            if report_path:
-                with open(report_path, 'rb') as f:
-                    payload = {"content": main_content}
-                    files = {"file": (report_path, f, "image/png")}
-                    requests.post(webhook_url, data=payload, files=files)
-                print("✅ Discord Report Sent!")
-        except Exception as e:
-            print(f"❌ Failed to send Discord: {e}")
+        if missing:
+            # Tickers without a quote are left out of the totals; say so rather than drop them silently
+            main_content += f"\n⚠️ No quote for: {', '.join(missing)}"
+        if stale:
+            main_content += f"\n🕓 Last-good quote for: {', '.join(stale)}"
+        if stats_line:
+            main_content += f"\n📐 {stats_line}"
+        main_content += f"\n-# {self.metrics.summary_line()}"
 
-    def _generate_html(self, portfolio_rows, total_value, total_gain_all, day_gain_all, total_day_pct):
+        if report_path:
+            return self.notifier.submit(main_content, [report_path, graph_path])
+        return None
+
+    def _generate_html(self, portfolio_rows, total_value, total_gain_all, day_gain_all, total_day_pct,
+                       title="Portfolio Report", stats_line=None):
         rows_html = ""
         for row in portfolio_rows:
             day_color = "#4caf50" if row['day_gain'] >= 0 else "#f44336"
@@ -159,6 +188,7 @@ class PortfolioManager:
             </tr>
             """
         
+        stats_html = f'<div class="stats">{stats_line}</div>' if stats_line else ""
         total_color_hex = "#4caf50" if total_gain_all >= 0 else "#f44336"
         day_color_hex = "#4caf50" if day_gain_all >= 0 else "#f44336"
 
@@ -174,11 +204,12 @@ class PortfolioManager:
                 th:first-child {{ text-align: left; }}
                 td {{ padding: 10px 8px; font-size: 14px; border-bottom: 1px solid #40444b; }}
                 .footer {{ margin-top: 15px; display: flex; justify-content: space-between; font-weight: bold; color: #fff; font-size: 16px; }}
+                .stats {{ margin-top: 10px; width: 600px; color: #b9bbbe; font-size: 12px; }}
             </style>
         </head>
         <body>
             <div class="container">
-                <h2>📊 Portfolio Report</h2>
+                <h2>📊 {title}</h2>
                 <table>
                     <tr>
                         <th>TICKER</th> <th>PRICE</th> <th>SHARES</th> <th>VALUE</th> <th>DAY %</th> <th>DAY P&L</th> <th>TOTAL P&L</th>
@@ -190,81 +221,348 @@ class PortfolioManager:
                     <div>Total: <span style="color:{total_color_hex}">${total_gain_all:,.2f}</span></div>
                     <div>Equity: ${total_value:,.2f}</div>
                 </div>
+                {stats_html}
             </div>
         </body>
         </html>
         """
         return html
 
+    def _build_providers(self):
+        if self.quote_source == 'browser':
+            return []
+        return [HttpQuoteProvider(base_url=self.quote_url, pool_size=self.concurrency)]
+
+    def _build_engine(self):
+        return AsyncScanEngine(headless=self.headless,
+                               concurrency=self.concurrency,
+                               min_host_interval=self.min_host_interval,
+                               providers=self._build_providers(),
+                               request_filter=self.request_filter,
+                               fetch_deadline=self.fetch_deadline,
+                               hedge=self.hedge,
+                               metrics=self.metrics,
+                               quote_url=self.quote_url,
+                               browser_fallback=self.quote_source != 'http-only')
+
+    @timed("fetch")
+    async def _fetch_quotes(self, engine, serve_cached=True, run_key=None):
+        """Quotes for every ticker: this run's checkpoints, fresh cache hits, live fetches, then last-good fallbacks.
+
+        With a `run_key`, each ticker is checkpointed as soon as it's known,
+        so a rerun of the same run only fetches what is missing or failed.
+        """
+        resumed = {}
+        checkpoint = None
+        if run_key is not None:
+            resumed = {t: q for t, q in self.db.load_checkpoints(run_key).items() if t in self.tickers}
+            checkpoint = lambda ticker, quote: self.db.checkpoint(run_key, ticker, quote)
+            if resumed:
+                self.logger.info(f"♻️ Resuming run {run_key}: {len(resumed)} ticker(s) already fetched.")
+        pending = [t for t in self.tickers if t not in resumed]
+
+        cached = self.quote_cache.fresh(pending) if serve_cached and self.use_quote_cache else {}
+        to_fetch = [t for t in pending if t not in cached]
+        if cached:
+            self.logger.info(f"🗃️ {len(cached)} quote(s) served from cache, fetching {len(to_fetch)}.")
+            if checkpoint is not None:
+                for ticker, quote in cached.items():
+                    checkpoint(ticker, quote)
+
+        def on_quote(ticker, quote):
+            if checkpoint is not None:
+                checkpoint(ticker, quote)
+            if self.alerts is not None:
+                self.alerts.check_quote(quote)
+
+        if self.alerts is not None:
+            for quote in (*resumed.values(), *cached.values()):
+                self.alerts.check_quote(quote)
+        live = await engine.fetch_all(to_fetch, on_quote=on_quote) if to_fetch else {}
+        self.quote_cache.store(live.values())
+
+        failed = [t for t, quote in live.items() if quote is None]
+        fallback = self.quote_cache.last_good(failed)
+        if fallback:
+            self.logger.warning(f"🕓 Using last-good quotes for: {', '.join(sorted(fallback))}")
+        self.stale_tickers = set(fallback)
+        return {**live, **fallback, **cached, **resumed}
+
+    @timed("parse")
+    def _parse_quotes(self, quotes):
+        """Quotes -> price, day-change and previous-close arrays aligned with self.tickers.
+
+        Tickers without a quote get NaN and drop out of the report.
+        """
+        prices = np.full(len(self.tickers), np.nan)
+        day_pcts = np.full(len(self.tickers), np.nan)
+        prev_closes = np.full(len(self.tickers), np.nan)
+        pct_labels = []
+        for i, ticker in enumerate(self.tickers):
+            quote = quotes.get(ticker)
+            if quote is None:
+                pct_labels.append("0.00%")
+                continue
+            pct_labels.append(quote.label)
+            prices[i] = quote.price
+            day_pcts[i] = quote.change_pct / 100.0
+            if quote.prev_close is not None:
+                prev_closes[i] = quote.prev_close
+        return prices, day_pcts, prev_closes, pct_labels
+
+    def _title(self, base, portfolio):
+        # Single-portfolio runs keep the original titles and file names
+        return base if len(self.portfolio_names) == 1 else f"{base} — {portfolio}"
+
+    def _asset_path(self, base, portfolio):
+        if len(self.portfolio_names) == 1:
+            return base
+        stem, ext = os.path.splitext(base)
+        return f"{stem}_{portfolio}{ext}"
+
+    async def _report_portfolio(self, engine, snapshot, index, name, pct_labels, started_at, run_key=None):
+        portfolio_rows = snapshot.rows(index, pct_labels=pct_labels)
+        totals = snapshot.totals(index)
+        for row in portfolio_rows:
+            print(f"✅ {row['ticker']}: ${row['value']:,.0f} ({row['pct_change']})")
+
+        missing = snapshot.missing(index)
+        self.save_scan(started_at, portfolio_rows, *totals, portfolio=name, run_key=run_key,
+                       missing_count=len(missing))
+        if self.alerts is not None:
+            self.alerts.check_positions(name, portfolio_rows, totals[0])
+        graph_path = self.update_history_graph(self._asset_path("history_graph.png", name), portfolio=name)
+        await self._publish_report(engine, portfolio_rows, totals, name, missing=missing,
+                                   graph_path=graph_path, stats_line=self.performance_line(name))
+
+    async def _publish_report(self, engine, portfolio_rows, totals, name, missing=(), graph_path=None,
+                              stats_line=None):
+        stale = [row['ticker'] for row in portfolio_rows if row['ticker'] in self.stale_tickers]
+        total_equity, total_pl_all, day_pl_all, total_day_pct = totals
+        report_path = self._asset_path("portfolio_report.png", name)
+        title = self._title("Portfolio Report", name)
+        if self.renderer == 'html':
+            print("🎨 Generating HTML Report...")
+            with self.metrics.stage("render"):
+                html_content = self._generate_html(portfolio_rows, total_equity, total_pl_all, day_pl_all,
+                                                   total_day_pct, title=title, stats_line=stats_line)
+            with self.metrics.stage("screenshot"):
+                await engine.screenshot_html(html_content, report_path)
+        else:
+            print("🎨 Rendering Report Image...")
+            with self.metrics.stage("render"):
+                render_report_image(portfolio_rows, total_equity, total_pl_all, day_pl_all, total_day_pct,
+                                    report_path, title=title, stats_line=stats_line)
+
+        self.send_discord_report(total_equity, total_pl_all, day_pl_all, total_day_pct, report_path,
+                                 title=self._title("Daily Portfolio Scan", name), missing=missing,
+                                 stale=stale, graph_path=graph_path, stats_line=stats_line)
+
     def run(self):
+        asyncio.run(self._run_async())
+
+    async def _run_async(self):
         self.logger.info("🚀 Starting Portfolio Scan...")
-        total_equity = 0.0
-        total_pl_all = 0.0
-        day_pl_all = 0.0
-        portfolio_rows = []
-
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=self.headless)
-            page = browser.new_page()
-
-            for ticker in self.tickers:
-                price_str = self._get_price_cnbc(page, ticker)
-                change_pct_str = self._get_change_cnbc(page)
-                
-                if price_str:
-                    try:
-                        price = float(price_str)
-                        data = self.portfolio_data[ticker]
-                        shares = data['shares']
-                        cost_basis = data['cost']
-                        value = price * shares
-                        total_equity += value
-
-                        total_gain = (price - cost_basis) * shares
-                        total_pl_all += total_gain
-
-                        if "UNCH" in change_pct_str.upper(): change_pct_str = "0.00%"
-                        clean_pct = change_pct_str.replace('%', '').replace('+', '')
-                        pct_float = float(clean_pct) / 100.0
-                        
-                        previous_value_stock = value / (1 + pct_float)
-                        day_gain = value - previous_value_stock
-                        day_pl_all += day_gain
-                        
-                        # --- UPDATE: Added 'pct_change' to the list ---
-                        portfolio_rows.append({
-                            "ticker": ticker,
-                            "price": price,
-                            "shares": shares,
-                            "value": value,
-                            "day_gain": day_gain,
-                            "total_gain": total_gain,
-                            "pct_change": change_pct_str
-                        })
-                        print(f"✅ {ticker}: ${value:,.0f} ({change_pct_str})")
-                        self.save_to_db(ticker, price, shares, value, change_pct_str)
-                    except ValueError:
-                        print(f"❌ Error {ticker}")
-                time.sleep(1)
-
-            previous_equity_all = total_equity - day_pl_all
-            if previous_equity_all > 0:
-                total_day_pct = (day_pl_all / previous_equity_all) * 100
-            else:
-                total_day_pct = 0.0
+        started_at = datetime.now()
+        self.metrics = self.notifier.metrics = RunMetrics()
 
-            print("🎨 Generating HTML Report...")
-            html_content = self._generate_html(portfolio_rows, total_equity, total_pl_all, day_pl_all, total_day_pct)
-            page.set_content(html_content)
-            time.sleep(0.5)
-            report_path = "portfolio_report.png"
-            page.locator(".container").screenshot(path=report_path)
-            
-            browser.close()
+        trading_day = market_calendar.trading_day()
+        run_key = f"{trading_day.isoformat()}:{self.run_id}"
+        self.db.begin_run(run_key, trading_day.isoformat(), self.run_id, len(self.tickers))
+
+        engine = self._build_engine()
+        async with engine:
+            quotes = await self._fetch_quotes(engine, run_key=run_key)
+            status = self.db.finish_run(run_key)
+            self.logger.info(f"🧾 Run {run_key} is {status}.")
+
+            prices, day_pcts, prev_closes, pct_labels = self._parse_quotes(quotes)
+            # One vectorized pass prices every portfolio; each then gets its own rows/scan/report
+            with self.metrics.stage("compute"):
+                snapshot = self.positions.compute(prices, day_pcts, prev_closes)
+            for index, name in enumerate(self.portfolio_names):
+                await self._report_portfolio(engine, snapshot, index, name, pct_labels, started_at, run_key=run_key)
+            self.flush_alerts()
+            # Posts went out in the background while later portfolios were processed
+            await self.notifier.drain()
 
-        self.send_discord_report(total_equity, total_pl_all, day_pl_all, total_day_pct, report_path)
+        self._save_metrics(run_key)
+        self.notifier.close()
+        self.db.close()
+
+    def flush_alerts(self):
+        if self.alerts is None:
+            return
+        try:
+            self.alerts.flush()
+        except Exception as e:
+            self.logger.error(f"Alert Error: {e}")
+
+    def _save_metrics(self, run_key):
+        self.logger.info(self.metrics.summary_line())
+        try:
+            self.metrics.save(self.db, run_key)
+            if self.metrics_json:
+                self.metrics.dump_json(self.metrics_json, run_key=run_key)
+        except Exception as e:
+            self.logger.error(f"Couldn't save run metrics: {e}")
+
+    def run_daemon(self, interval=60, idle_interval=300, notify_move_pct=1.0, extended_hours=False):
+        asyncio.run(self._daemon_async(interval, idle_interval, notify_move_pct, extended_hours))
+
+    def _refresh_holdings(self):
+        """Rebuild positions if any portfolio file changed on disk (a stat() per file otherwise)."""
+        holdings = []
+        for path in self.portfolio_files:
+            try:
+                holdings.append(load_holdings(path))
+            except (FileNotFoundError, ValueError) as e:
+                self.logger.warning(f"Keeping previous holdings, couldn't reload {path}: {e}")
+                return
+        if any(new is not old for new, old in zip(holdings, self.holdings)):
+            self.logger.info("🔄 Portfolio files changed, reloading positions.")
+            self.holdings = holdings
+            self.positions = PositionsEngine.from_holdings(holdings, self.portfolio_names)
+            self.tickers = self.positions.tickers
+
+    def _changed_tickers(self, prices, day_pcts, last_ticks):
+        """Tickers whose price or day change differs from the last persisted tick; updates `last_ticks`."""
+        changed = set()
+        for i, ticker in enumerate(self.tickers):
+            if np.isnan(prices[i]):
+                continue
+            tick = (float(prices[i]), float(day_pcts[i]))
+            if last_ticks.get(ticker) != tick:
+                last_ticks[ticker] = tick
+                changed.add(ticker)
+        return changed
+
+    async def _daemon_async(self, interval, idle_interval, notify_move_pct, extended_hours):
+        """Poll quotes with a warm browser and DB connection while the market is open.
+
+        Each poll stores only tickers that moved, as a 'tick' scan. A report
+        is re-rendered and posted only when a portfolio's equity has moved
+        more than `notify_move_pct` percent since the last post. When the
+        session ends, a full scan and report are written like a regular run.
+        """
+        live_sessions = {market_calendar.OPEN}
+        if extended_hours:
+            live_sessions |= {market_calendar.PRE_MARKET, market_calendar.POST_MARKET}
+
+        last_ticks = {}
+        notified_equity = {}
+        last_snapshot = None
+        self.logger.info(f"👀 Daemon started (every {interval}s, notify on {notify_move_pct:.2f}% moves).")
+
+        engine = self._build_engine()
+        try:
+            async with engine:
+                while True:
+                    session = market_calendar.market_session()
+                    if session not in live_sessions:
+                        if last_snapshot is not None:
+                            # Session just ended: write the closing scan and report
+                            snapshot, pct_labels = last_snapshot
+                            run_key = f"{market_calendar.trading_day().isoformat()}:daemon"
+                            self.metrics = engine.metrics = self.notifier.metrics = RunMetrics()
+                            for index, name in enumerate(self.portfolio_names):
+                                await self._report_portfolio(engine, snapshot, index, name, pct_labels, datetime.now(),
+                                                             run_key=run_key)
+                            self.flush_alerts()
+                            self._save_metrics(run_key)
+                            last_snapshot = None
+                            last_ticks.clear()
+                            notified_equity.clear()
+                        await asyncio.sleep(idle_interval)
+                        continue
+
+                    self._refresh_holdings()
+                    started_at = datetime.now()
+                    # Fresh timings per poll, so a post's summary line covers just that poll
+                    self.metrics = engine.metrics = self.notifier.metrics = RunMetrics()
+                    # Ticks always go to the network; the cache only covers failures
+                    quotes = await self._fetch_quotes(engine, serve_cached=False)
+                    prices, day_pcts, prev_closes, pct_labels = self._parse_quotes(quotes)
+                    changed = self._changed_tickers(prices, day_pcts, last_ticks)
+                    snapshot = self.positions.compute(prices, day_pcts, prev_closes)
+                    last_snapshot = (snapshot, pct_labels)
+
+                    for index, name in enumerate(self.portfolio_names):
+                        rows = snapshot.rows(index, pct_labels=pct_labels)
+                        moved = [row for row in rows if row['ticker'] in changed]
+                        if not moved:
+                            continue
+                        totals = snapshot.totals(index)
+                        self.save_scan(started_at, moved, *totals, portfolio=name, scan_type='tick',
+                                       missing_count=len(snapshot.missing(index)))
+                        if self.alerts is not None:
+                            self.alerts.check_positions(name, rows, totals[0])
+
+                        equity = totals[0]
+                        baseline = notified_equity.setdefault(name, equity)
+                        if baseline and abs(equity - baseline) / baseline * 100 >= notify_move_pct:
+                            self.logger.info(f"📣 {name} moved {(equity - baseline) / baseline * 100:+.2f}%, posting report.")
+                            await self._publish_report(engine, rows, totals, name, missing=snapshot.missing(index))
+                            notified_equity[name] = equity
+
+                    self.flush_alerts()
+                    self._save_metrics(f"{market_calendar.trading_day().isoformat()}:tick:{started_at:%H%M%S}")
+                    await asyncio.sleep(interval)
+        finally:
+            await self.notifier.drain()
+            self.notifier.close()
+            self.db.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan the portfolio and post the daily report.")
+    parser.add_argument("--portfolio", dest="portfolios", action="append",
+                        help="portfolio file to scan; repeat for several accounts (default: portfolio.json)")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv('SCAN_CONCURRENCY', '4')),
+                        help="max quote fetches in flight")
+    parser.add_argument("--quote-source", choices=["http", "browser", "http-only"],
+                        default=os.getenv('QUOTE_SOURCE', 'http'),
+                        help="'http' with Chromium fallback, 'browser' only, or 'http-only' without Chromium")
+    parser.add_argument("--renderer", choices=["image", "html"], default=os.getenv('REPORT_RENDERER', 'image'),
+                        help="draw the report with Pillow, or screenshot the HTML template")
+    parser.add_argument("--allow-domain", action="append", default=[],
+                        help="extra third-party domain quote pages may load in Chromium")
+    parser.add_argument("--deny-domain", action="append", default=[],
+                        help="extra domain to block on quote pages")
+    parser.add_argument("--fetch-deadline", type=float, default=float(os.getenv('FETCH_DEADLINE', '30')),
+                        help="max seconds spent on one ticker across all sources and retries")
+    parser.add_argument("--hedge", action="store_true",
+                        help="send a backup request to the next source when a fetch runs past its p90 latency")
+    parser.add_argument("--no-quote-cache", action="store_true",
+                        help="always fetch live quotes instead of serving fresh ones from the DB")
+    parser.add_argument("--run-id", default=os.getenv('GITHUB_RUN_ID'),
+                        help="run identity within a trading day; rerunning the same id resumes it "
+                             "(default: GITHUB_RUN_ID, else a new id per invocation)")
+    parser.add_argument("--metrics-json", default=os.getenv('METRICS_JSON'),
+                        help="also write this run's stage timings to a JSON file")
+    parser.add_argument("--alerts", default=os.getenv('ALERTS_FILE', 'alerts.json'),
+                        help="JSON list of price alert rules (skipped if the file doesn't exist)")
+    parser.add_argument("--archive", default=os.getenv('HISTORY_ARCHIVE'),
+                        help="history .npz from `compact_db.py --export`; "
+                             "the graph and analytics use its days older than the database")
+    parser.add_argument("--daemon", action="store_true",
+                        help="keep running and poll quotes during market hours instead of a single scan")
+    parser.add_argument("--interval", type=int, default=60, help="daemon poll interval in seconds")
+    parser.add_argument("--notify-move-pct", type=float, default=1.0,
+                        help="daemon re-posts the report once equity moves this many percent")
+    parser.add_argument("--extended-hours", action="store_true", help="daemon also polls pre/post market")
+    args = parser.parse_args()
+
     is_cloud = os.getenv('CI') is not None
-    bot = PortfolioManager(headless=is_cloud)
-    bot.run()
\ No newline at end of file
+    bot = PortfolioManager(headless=is_cloud, concurrency=args.concurrency,
+                           quote_source=args.quote_source, renderer=args.renderer,
+                           portfolio_files=args.portfolios or ['portfolio.json'],
+                           allow_domains=args.allow_domain, deny_domains=args.deny_domain,
+                           fetch_deadline=args.fetch_deadline, hedge=args.hedge,
+                           use_quote_cache=not args.no_quote_cache, run_id=args.run_id,
+                           metrics_json=args.metrics_json, alerts_file=args.alerts,
+                           archive_file=args.archive)
+    if args.daemon:
+        bot.run_daemon(interval=args.interval, notify_move_pct=args.notify_move_pct,
+                       extended_hours=args.extended_hours)
+    else:
+        bot.run()
\ No newline at end of file
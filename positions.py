@@ -0,0 +1,139 @@
+import numpy as np
+
+
+def _first_seen_codes(labels):
+    """Like np.unique(..., return_inverse=True) but keeps first-appearance order."""
+    uniq, first_idx, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    order = np.argsort(first_idx, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return uniq[order], rank[inverse.reshape(-1)]
+
+
+class PositionsSnapshot:
+    """Per-position and per-portfolio P&L for one set of quotes.
+
+    Position arrays are indexed by position (portfolio x symbol pairs that
+    actually hold lots); the totals arrays are indexed by portfolio.
+    """
+
+    def __init__(self, engine, price, day_pct, prev_close=None):
+        self.engine = engine
+        pos_symbol = engine.pos_symbol
+
+        self.price = price[pos_symbol]
+        self.day_pct = day_pct[pos_symbol]
+        self.prev_close = np.full(len(pos_symbol), np.nan) if prev_close is None else prev_close[pos_symbol]
+        self.shares = engine.pos_shares
+        self.cost = engine.pos_cost
+        self.valid = ~np.isnan(self.price) & ~np.isnan(self.day_pct)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.value = self.price * self.shares
+            self.total_gain = (self.price - self.cost) * self.shares
+            # Use the quoted previous close where we have it; otherwise back it out of the day change
+            self.day_gain = np.where(np.isnan(self.prev_close),
+                                     self.value - self.value / (1 + self.day_pct),
+                                     (self.price - self.prev_close) * self.shares)
+
+        n = len(engine.portfolio_names)
+        pos_portfolio = engine.pos_portfolio
+        self.equity = np.bincount(pos_portfolio, weights=np.where(self.valid, self.value, 0.0), minlength=n)
+        self.total_pl = np.bincount(pos_portfolio, weights=np.where(self.valid, self.total_gain, 0.0), minlength=n)
+        self.day_pl = np.bincount(pos_portfolio, weights=np.where(self.valid, self.day_gain, 0.0), minlength=n)
+
+        previous_equity = self.equity - self.day_pl
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.total_day_pct = np.where(previous_equity > 0, self.day_pl / previous_equity * 100, 0.0)
+
+    def totals(self, portfolio=0):
+        """(total_equity, total_pl, day_pl, total_day_pct) as plain floats."""
+        return (float(self.equity[portfolio]), float(self.total_pl[portfolio]),
+                float(self.day_pl[portfolio]), float(self.total_day_pct[portfolio]))
+
+    def missing(self, portfolio=0):
+        """Tickers held in a portfolio that had no usable quote, so aren't in its rows or totals."""
+        engine = self.engine
+        picked = np.flatnonzero((engine.pos_portfolio == portfolio) & ~self.valid)
+        return [str(engine.symbols[engine.pos_symbol[i]]) for i in picked.tolist()]
+
+    def rows(self, portfolio=0, pct_labels=None):
+        """Report rows (the dicts `_generate_html` and the DB expect) for one portfolio."""
+        engine = self.engine
+        picked = np.flatnonzero((engine.pos_portfolio == portfolio) & self.valid)
+        rows = []
+        for i in picked.tolist():
+            symbol = int(engine.pos_symbol[i])
+            ticker = str(engine.symbols[symbol])
+            rows.append({
+                "ticker": ticker,
+                "price": float(self.price[i]),
+                "shares": float(self.shares[i]),
+                "value": float(self.value[i]),
+                "day_gain": float(self.day_gain[i]),
+                "total_gain": float(self.total_gain[i]),
+                "pct_change": pct_labels[symbol] if pct_labels else f"{self.day_pct[i] * 100:.2f}%",
+            })
+        return rows
+
+
+class PositionsEngine:
+    """Shares and cost basis for any number of portfolios, held as NumPy arrays.
+
+    Lots are collapsed once into positions (one per portfolio/symbol pair)
+    with `np.bincount`; `compute` then prices every position in a single
+    vectorized pass.
+    """
+
+    def __init__(self, lot_tickers, lot_shares, lot_prices, lot_portfolios=None, portfolio_names=("default",)):
+        self.portfolio_names = list(portfolio_names)
+        lot_shares = np.asarray(lot_shares, dtype=np.float64)
+        lot_prices = np.asarray(lot_prices, dtype=np.float64)
+        if lot_portfolios is None:
+            lot_portfolios = np.zeros(len(lot_shares), dtype=np.int64)
+        lot_portfolios = np.asarray(lot_portfolios, dtype=np.int64)
+
+        # Symbols shared across portfolios, in the order they first appear
+        self.symbols, lot_symbol = _first_seen_codes(np.asarray(lot_tickers, dtype=str))
+        n_symbols = len(self.symbols)
+
+        # Collapse lots into (portfolio, symbol) positions
+        lot_key = lot_portfolios * n_symbols + lot_symbol
+        keys, pos_of_lot = _first_seen_codes(lot_key)
+        keys = keys.astype(np.int64)
+        self.pos_portfolio = keys // max(n_symbols, 1)
+        self.pos_symbol = keys % max(n_symbols, 1)
+
+        n_pos = len(keys)
+        self.pos_shares = np.bincount(pos_of_lot, weights=lot_shares, minlength=n_pos)
+        invested = np.bincount(pos_of_lot, weights=lot_shares * lot_prices, minlength=n_pos)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.pos_cost = np.where(self.pos_shares > 0, invested / self.pos_shares, 0.0)
+
+    @classmethod
+    def from_holdings(cls, holdings, portfolio_names=("default",)):
+        """Build from one `Holdings` per portfolio without touching individual lots in Python."""
+        if not isinstance(holdings, (list, tuple)):
+            holdings = [holdings]
+        owners = np.concatenate([np.full(len(h), i, dtype=np.int64) for i, h in enumerate(holdings)])
+        return cls(np.concatenate([h.tickers for h in holdings]),
+                   np.concatenate([h.shares for h in holdings]),
+                   np.concatenate([h.prices for h in holdings]),
+                   owners, portfolio_names=portfolio_names)
+
+    @property
+    def tickers(self):
+        return [str(s) for s in self.symbols]
+
+    def compute(self, prices, day_pcts, prev_closes=None):
+        """Price every position at once.
+
+        `prices`, `day_pcts` and `prev_closes` are aligned with `symbols`; day
+        changes are fractions (-0.0123 for -1.23%). NaN marks a ticker with no
+        usable quote, which is left out of rows and totals. A NaN previous
+        close falls back to reconstructing it from the day change.
+        """
+        price = np.asarray(prices, dtype=np.float64)
+        day_pct = np.asarray(day_pcts, dtype=np.float64)
+        prev_close = None if prev_closes is None else np.asarray(prev_closes, dtype=np.float64)
+        return PositionsSnapshot(self, price, day_pct, prev_close)
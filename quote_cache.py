@@ -0,0 +1,76 @@
+import time
+from datetime import datetime, timedelta
+
+import market_calendar
+from quotes import Quote
+
+# How long a cached quote stays fresh while prices can still move, by session
+DEFAULT_TTLS = {
+    market_calendar.OPEN: 60,
+    market_calendar.PRE_MARKET: 300,
+    market_calendar.POST_MARKET: 300,
+    market_calendar.CLOSED: 6 * 3600,
+    market_calendar.HOLIDAY: 6 * 3600,
+}
+
+# Closing prints keep trickling in for a few minutes after the bell
+CLOSE_SETTLE = timedelta(minutes=15)
+
+_COLUMNS = "ticker, price, change, change_pct, prev_close, volume, quote_time, source, fetched_at"
+
+
+class QuoteCache:
+    """Last good quote per ticker, kept in the bot's SQLite DB.
+
+    Outside the regular session a quote scraped after the last close has
+    settled is final until the next open, so it is served as-is; otherwise
+    a quote is fresh for the current session's TTL. `last_good` hands back
+    older quotes, marked stale, for tickers a live fetch couldn't read.
+    """
+
+    def __init__(self, db, ttls=None):
+        self.conn = db.conn
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+
+    def is_fresh(self, fetched_at, now=None):
+        now = now if now is not None else time.time()
+        eastern_now = datetime.fromtimestamp(now, market_calendar.EASTERN)
+        session = market_calendar.market_session(eastern_now)
+        if session != market_calendar.OPEN:
+            settled = market_calendar.last_close(eastern_now) + CLOSE_SETTLE
+            if fetched_at >= settled.timestamp():
+                return True
+        return now - fetched_at < self.ttls[session]
+
+    def _load(self, tickers):
+        tickers = list(tickers)
+        if not tickers:
+            return {}
+        marks = ",".join("?" * len(tickers))
+        rows = self.conn.execute(f"SELECT {_COLUMNS} FROM quote_cache WHERE ticker IN ({marks})", tickers)
+        return {row[0]: Quote(row[0], row[1], change=row[2], change_pct=row[3], prev_close=row[4],
+                              volume=row[5], quote_time=row[6], source=row[7], fetched_at=row[8])
+                for row in rows}
+
+    def fresh(self, tickers, now=None):
+        """{ticker: Quote} for the tickers whose cached quote can be served without a fetch."""
+        return {t: q for t, q in self._load(tickers).items() if self.is_fresh(q.fetched_at, now)}
+
+    def last_good(self, tickers):
+        """{ticker: Quote} of whatever is cached for these tickers, marked stale."""
+        quotes = self._load(tickers)
+        for quote in quotes.values():
+            quote.stale = True
+        return quotes
+
+    def store(self, quotes):
+        """Upsert live quotes (stale ones are already in the cache)."""
+        with self.conn:
+            self.conn.executemany(f'''
+                INSERT INTO quote_cache ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(ticker) DO UPDATE SET
+                    price = excluded.price, change = excluded.change, change_pct = excluded.change_pct,
+                    prev_close = excluded.prev_close, volume = excluded.volume,
+                    quote_time = excluded.quote_time, source = excluded.source, fetched_at = excluded.fetched_at
+            ''', [(q.ticker, q.price, q.change, q.change_pct, q.prev_close, q.volume, q.quote_time, q.source,
+                   q.fetched_at) for q in quotes if q is not None and not q.stale])
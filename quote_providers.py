@@ -0,0 +1,160 @@
+import asyncio
+import json
+import logging
+import re
+from abc import ABC, abstractmethod
+
+import requests
+from lxml import etree
+from lxml import html as lxml_html
+from requests.adapters import HTTPAdapter
+
+from quotes import Quote, parse_change_strip, parse_number
+
+CNBC_QUOTE_URL = "https://www.cnbc.com/quotes/{ticker}"
+
+_EMBEDDED_STATE = re.compile(r'window\.__s_data\s*=\s*')
+
+
+def _class_xpath(class_name):
+    return f"//*[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]"
+
+
+class QuoteProvider(ABC):
+    """Base class for quote sources.
+
+    `fetch_quote` returns a `Quote`, or None if the ticker couldn't be
+    read (unparseable page, 4xx), in which case the scan engine falls
+    through to the next source. Network errors and 5xx responses should
+    raise instead: only those count against the source's circuit breaker.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def quote_url(self, ticker):
+        """URL fetched for `ticker`; the scheduler rate-limits on its host."""
+
+    @abstractmethod
+    async def fetch_quote(self, ticker):
+        """The ticker's `Quote`, or None if it couldn't be read."""
+
+    async def close(self):
+        pass
+
+
+class HttpQuoteProvider(QuoteProvider):
+    """Reads CNBC quote pages over plain HTTP, no browser involved.
+
+    Prefers the JSON state CNBC embeds in the page and falls back to the
+    QuoteStrip elements in the server-rendered markup.
+    """
+
+    name = "http"
+
+    def __init__(self, base_url=CNBC_QUOTE_URL, pool_size=4, timeout=10):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.logger = logging.getLogger()
+        # Response size of each ticker's latest page, for run metrics
+        self.bytes_by_ticker = {}
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "User-Agent": ("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+                           "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"),
+            "Accept": "text/html,application/xhtml+xml",
+        })
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def quote_url(self, ticker):
+        return self.base_url.format(ticker=ticker)
+
+    async def fetch_quote(self, ticker):
+        return await asyncio.to_thread(self._fetch_sync, ticker)
+
+    async def close(self):
+        self.session.close()
+
+    def _fetch_sync(self, ticker):
+        # Connection errors, timeouts and 5xx propagate: the source is unhealthy, not the ticker
+        resp = self.session.get(self.quote_url(ticker), timeout=self.timeout)
+        self.bytes_by_ticker[ticker] = len(resp.content)
+        if resp.status_code >= 500:
+            resp.raise_for_status()
+        if not resp.ok:
+            self.logger.warning(f"HTTP quote fetch failed for {ticker}: {resp.status_code} {resp.reason}")
+            return None
+        return self.parse_quote_page(resp.text, ticker)
+
+    def parse_quote_page(self, page_html, ticker):
+        quote = self._parse_embedded_json(page_html, ticker)
+        if quote is None:
+            quote = self._parse_markup(page_html, ticker)
+        return quote
+
+    def _parse_embedded_json(self, page_html, ticker):
+        match = _EMBEDDED_STATE.search(page_html)
+        if not match:
+            return None
+        try:
+            state, _ = json.JSONDecoder().raw_decode(page_html, match.end())
+        except ValueError:
+            return None
+
+        # Walk the state tree looking for this symbol's quote record
+        stack = [state]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                if node.get("symbol") == ticker and "last" in node:
+                    return Quote.from_record(ticker, {
+                        "price": node.get("last"),
+                        "change": node.get("change"),
+                        "change_pct": node.get("change_pct"),
+                        "prev_close": node.get("previous_day_closing"),
+                        "volume": node.get("volume"),
+                        "quote_time": node.get("last_time"),
+                    }, source=self.name)
+                stack.extend(node.values())
+            elif isinstance(node, list):
+                stack.extend(node)
+        return None
+
+    def _parse_markup(self, page_html, ticker):
+        try:
+            doc = lxml_html.fromstring(page_html)
+        except (ValueError, etree.ParserError):
+            return None
+
+        def first_text(root, class_name):
+            nodes = root.xpath("." + _class_xpath(class_name))
+            return nodes[0].text_content().strip() if nodes else None
+
+        price = parse_number(first_text(doc, "QuoteStrip-lastPrice"))
+        if price is None:
+            return None
+
+        down = first_text(doc, "QuoteStrip-changeDown")
+        up = first_text(doc, "QuoteStrip-changeUp")
+        if down is not None:
+            change, change_pct = parse_change_strip(down, negative=True)
+        elif up is not None:
+            change, change_pct = parse_change_strip(up, negative=False)
+        else:
+            change, change_pct = 0.0, 0.0
+
+        stats = {}
+        for stat in doc.xpath(_class_xpath("Summary-stat")):
+            label = first_text(stat, "Summary-label")
+            value = first_text(stat, "Summary-value")
+            if label and value:
+                stats[label.lower()] = value
+
+        return Quote(ticker, price, change=change, change_pct=change_pct,
+                     prev_close=parse_number(stats.get("prev close") or stats.get("previous close")),
+                     volume=parse_number(stats.get("volume")),
+                     quote_time=first_text(doc, "QuoteStrip-lastTradeTime"),
+                     source=self.name)
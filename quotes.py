@@ -0,0 +1,83 @@
+import re
+import time
+
+_NUMBER = re.compile(r"[-+]?\d[\d,]*\.?\d*|[-+]?\.\d+")
+_SUFFIXES = {"K": 1e3, "M": 1e6, "B": 1e9, "T": 1e12}
+
+
+def parse_number(text):
+    """'1,234.56' -> 1234.56, '12.3M' -> 12300000.0, 'UNCH' / None -> None."""
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return float(text)
+    text = str(text).strip()
+    match = _NUMBER.search(text)
+    if not match:
+        return None
+    value = float(match.group().replace(',', ''))
+    suffix = text[match.end():match.end() + 1].upper()
+    return value * _SUFFIXES.get(suffix, 1.0)
+
+
+def parse_change_strip(full_text, negative):
+    """Split a QuoteStrip change string like '+1.23 (+0.45%)' into (1.23, 0.45).
+
+    CNBC's sign characters aren't reliable, so the direction comes from
+    which element (changeUp / changeDown) held the text.
+    """
+    sign = -1.0 if negative else 1.0
+    if "(" in full_text:
+        amount_text, pct_text = full_text.split("(", 1)
+    else:
+        amount_text, pct_text = "", full_text
+    amount = parse_number(amount_text.replace("-", "").replace("+", ""))
+    pct = parse_number(pct_text.replace("-", "").replace("+", ""))
+    return (None if amount is None else sign * amount), (0.0 if pct is None else sign * pct)
+
+
+class Quote:
+    """One typed quote. `change_pct` is signed, in percent units (-1.23 for -1.23%)."""
+
+    __slots__ = ("ticker", "price", "change", "change_pct", "prev_close", "volume", "quote_time", "source",
+                 "fetched_at", "stale")
+
+    def __init__(self, ticker, price, change=None, change_pct=0.0, prev_close=None, volume=None,
+                 quote_time=None, source=None, fetched_at=None, stale=False):
+        self.ticker = ticker
+        self.price = price
+        self.change = change
+        self.change_pct = change_pct if change_pct is not None else 0.0
+        if prev_close is None and change is not None and price is not None:
+            prev_close = price - change
+        self.prev_close = prev_close
+        self.volume = volume
+        self.quote_time = quote_time
+        self.source = source
+        # Epoch seconds the quote was scraped; `stale` marks a last-good quote
+        # served because a live fetch failed
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+        self.stale = stale
+
+    @property
+    def label(self):
+        """Day change as shown in the report, e.g. '-1.23%' or '0.45%'."""
+        return "0.00%" if self.change_pct == 0 else f"{self.change_pct:.2f}%"
+
+    @classmethod
+    def from_record(cls, ticker, record, source=None):
+        """Build from a dict of raw or numeric fields; None if there's no usable price."""
+        price = parse_number(record.get("price"))
+        if price is None:
+            return None
+        return cls(ticker, price,
+                   change=parse_number(record.get("change")),
+                   change_pct=parse_number(record.get("change_pct")),
+                   prev_close=parse_number(record.get("prev_close")),
+                   volume=parse_number(record.get("volume")),
+                   quote_time=record.get("quote_time"),
+                   source=source)
+
+    def __repr__(self):
+        stale = ", stale" if self.stale else ""
+        return f"Quote({self.ticker}, {self.price}, {self.label}, source={self.source}{stale})"
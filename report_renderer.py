@@ -0,0 +1,159 @@
+from PIL import Image, ImageDraw, ImageFont
+
+# Same palette as the HTML template in PortfolioManager._generate_html
+CONTAINER_BG = "#36393f"
+HEADING = "#ffffff"
+HEADING_RULE = "#7289da"
+HEADER_TEXT = "#b9bbbe"
+HEADER_RULE = "#555555"
+CELL_TEXT = "#dcddde"
+ROW_RULE = "#40444b"
+GREEN = "#4caf50"
+RED = "#f44336"
+
+COLUMNS = ["TICKER", "PRICE", "SHARES", "VALUE", "DAY %", "DAY P&L", "TOTAL P&L"]
+# Relative widths of the 600px table
+COLUMN_WIDTHS = [96, 88, 72, 88, 80, 80, 96]
+
+PADDING = 20
+TABLE_WIDTH = sum(COLUMN_WIDTHS)
+CELL_PAD_X = 8
+HEADER_ROW_HEIGHT = 32
+ROW_HEIGHT = 40
+TITLE_HEIGHT = 52
+FOOTER_HEIGHT = 36
+STATS_LINE_HEIGHT = 20
+
+_FONT_CANDIDATES = {
+    False: ["DejaVuSans.ttf", "Arial.ttf", "arial.ttf"],
+    True: ["DejaVuSans-Bold.ttf", "Arial Bold.ttf", "arialbd.ttf"],
+}
+_font_cache = {}
+
+
+def _font(size, bold=False):
+    key = (size, bold)
+    if key not in _font_cache:
+        for name in _FONT_CANDIDATES[bold]:
+            try:
+                _font_cache[key] = ImageFont.truetype(name, size)
+                break
+            except OSError:
+                continue
+        else:
+            _font_cache[key] = ImageFont.load_default()
+    return _font_cache[key]
+
+
+def _text_top(font, top, height):
+    """y offset that vertically centres a line of `font` inside a band."""
+    left, upper, right, lower = font.getbbox("Ag")
+    return top + (height - (lower - upper)) / 2 - upper
+
+
+def _gain_color(amount):
+    return GREEN if amount >= 0 else RED
+
+
+def _row_cells(row):
+    day_color = _gain_color(row['day_gain'])
+    return [
+        (row['ticker'], HEADING),
+        (f"${row['price']:,.2f}", CELL_TEXT),
+        (f"{row['shares']:,.1f}", CELL_TEXT),
+        (f"${row['value']:,.0f}", CELL_TEXT),
+        (row['pct_change'], day_color),
+        (f"${row['day_gain']:,.0f}", day_color),
+        (f"${row['total_gain']:,.0f}", _gain_color(row['total_gain'])),
+    ]
+
+
+def _draw_cells(draw, top, height, cells, font, first_font=None):
+    x = PADDING
+    for i, ((text, color), width) in enumerate(zip(cells, COLUMN_WIDTHS)):
+        cell_font = first_font if (i == 0 and first_font) else font
+        y = _text_top(cell_font, top, height)
+        if i == 0:
+            draw.text((x + CELL_PAD_X, y), text, fill=color, font=cell_font)
+        else:
+            text_width = draw.textlength(text, font=cell_font)
+            draw.text((x + width - CELL_PAD_X - text_width, y), text, fill=color, font=cell_font)
+        x += width
+
+
+def _wrap_stats(draw, text, font):
+    """Split a ' · '-separated stats line into lines that fit the table width."""
+    lines, current = [], ""
+    for part in text.split(" · "):
+        candidate = f"{current} · {part}" if current else part
+        if current and draw.textlength(candidate, font=font) > TABLE_WIDTH:
+            lines.append(current)
+            candidate = part
+        current = candidate
+    return lines + [current] if current else lines
+
+
+def render_report_image(portfolio_rows, total_value, total_gain_all, day_gain_all, total_day_pct, path,
+                        title="Portfolio Report", stats_line=None):
+    """Draw the dark-mode portfolio table straight to PNG, no browser needed.
+
+    Mirrors the HTML report: same columns, number formats, colors and
+    footer totals, plus the optional analytics line under the footer.
+    """
+    stats_font = _font(12)
+    stats_lines = _wrap_stats(ImageDraw.Draw(Image.new("RGB", (1, 1))), stats_line, stats_font) if stats_line else []
+    width = TABLE_WIDTH + 2 * PADDING
+    height = (PADDING + TITLE_HEIGHT + HEADER_ROW_HEIGHT + ROW_HEIGHT * len(portfolio_rows)
+              + 15 + FOOTER_HEIGHT + STATS_LINE_HEIGHT * len(stats_lines) + PADDING)
+
+    img = Image.new("RGB", (width, height), CONTAINER_BG)
+    draw = ImageDraw.Draw(img)
+
+    # Title with its blue rule
+    y = PADDING
+    title_font = _font(22, bold=True)
+    draw.text((PADDING, _text_top(title_font, y, TITLE_HEIGHT - 16)), title, fill=HEADING, font=title_font)
+    y += TITLE_HEIGHT
+    draw.line([(PADDING, y - 8), (PADDING + TABLE_WIDTH, y - 8)], fill=HEADING_RULE, width=1)
+
+    # Header row
+    _draw_cells(draw, y, HEADER_ROW_HEIGHT, [(c, HEADER_TEXT) for c in COLUMNS], _font(12, bold=True))
+    y += HEADER_ROW_HEIGHT
+    draw.line([(PADDING, y - 1), (PADDING + TABLE_WIDTH, y - 1)], fill=HEADER_RULE, width=1)
+
+    # Position rows
+    cell_font = _font(14)
+    ticker_font = _font(14, bold=True)
+    for row in portfolio_rows:
+        _draw_cells(draw, y, ROW_HEIGHT, _row_cells(row), cell_font, first_font=ticker_font)
+        y += ROW_HEIGHT
+        draw.line([(PADDING, y - 1), (PADDING + TABLE_WIDTH, y - 1)], fill=ROW_RULE, width=1)
+
+    # Footer: Day / Total / Equity spread across the width
+    y += 15
+    footer_font = _font(16, bold=True)
+    footer_y = _text_top(footer_font, y, FOOTER_HEIGHT)
+
+    def draw_pair(x, label, value, color):
+        draw.text((x, footer_y), label, fill=HEADING, font=footer_font)
+        x += draw.textlength(label, font=footer_font)
+        draw.text((x, footer_y), value, fill=color, font=footer_font)
+        return x + draw.textlength(value, font=footer_font)
+
+    day_text = f"${day_gain_all:,.2f} ({total_day_pct:+.2f}%)"
+    total_text = f"${total_gain_all:,.2f}"
+    equity_text = f"Equity: ${total_value:,.2f}"
+
+    draw_pair(PADDING, "Day: ", day_text, _gain_color(day_gain_all))
+    total_width = draw.textlength("Total: " + total_text, font=footer_font)
+    draw_pair(PADDING + (TABLE_WIDTH - total_width) / 2, "Total: ", total_text, _gain_color(total_gain_all))
+    equity_width = draw.textlength(equity_text, font=footer_font)
+    draw.text((PADDING + TABLE_WIDTH - equity_width, footer_y), equity_text, fill=HEADING, font=footer_font)
+
+    y += FOOTER_HEIGHT
+    for line in stats_lines:
+        draw.text((PADDING, _text_top(stats_font, y, STATS_LINE_HEIGHT)), line, fill=HEADER_TEXT, font=stats_font)
+        y += STATS_LINE_HEIGHT
+
+    img.save(path)
+    return path
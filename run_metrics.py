@@ -0,0 +1,99 @@
+import functools
+import inspect
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+# Wall-clock stages shown in the one-line summary; per-page and per-ticker
+# stages (page_goto, rate_limit_wait, ...) add up across concurrent fetches
+SUMMARY_STAGES = ("browser_launch", "fetch", "history_graph", "render", "screenshot", "discord_upload")
+
+
+class RunMetrics:
+    """Wall-clock time per stage plus per-ticker fetch cost for one run.
+
+    Stages accumulate, so a stage entered once per portfolio reports its
+    total time and call count.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.tickers = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def add(self, name, ms):
+        total, calls = self.stages.get(name, (0.0, 0))
+        self.stages[name] = (total + ms, calls + 1)
+
+    def record_ticker(self, ticker, ms, attempts, source=None, bytes=0, ok=True):
+        self.tickers[ticker] = {"ms": ms, "attempts": attempts, "source": source, "bytes": bytes, "ok": ok}
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def summary_line(self):
+        """e.g. '⏱️ 8.4s · fetch 6.1s · render 0.3s · discord_upload 0.9s · 10/10 quotes, 2 retries, 1.2 MB'"""
+        parts = [f"⏱️ {self.total_ms / 1000:.1f}s"]
+        for name in SUMMARY_STAGES:
+            if name in self.stages:
+                parts.append(f"{name} {self.stages[name][0] / 1000:.1f}s")
+        if self.tickers:
+            ok = sum(t["ok"] for t in self.tickers.values())
+            retries = sum(max(t["attempts"] - 1, 0) for t in self.tickers.values())
+            mb = sum(t["bytes"] for t in self.tickers.values()) / 1e6
+            parts.append(f"{ok}/{len(self.tickers)} quotes, {retries} retries, {mb:.1f} MB")
+        return " · ".join(parts)
+
+    def to_dict(self):
+        return {
+            "total_ms": round(self.total_ms, 1),
+            "stages": {name: {"ms": round(ms, 1), "calls": calls} for name, (ms, calls) in self.stages.items()},
+            "tickers": self.tickers,
+        }
+
+    def dump_json(self, path, run_key=None):
+        with open(path, "w") as f:
+            json.dump(dict(self.to_dict(), run_key=run_key), f, indent=2)
+
+    def save(self, db, run_key):
+        """Append this run's stage and ticker rows to `run_metrics`."""
+        recorded_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = [(run_key, recorded_at, "run", "total", self.total_ms, None, None, None, None)]
+        rows += [(run_key, recorded_at, "stage", name, ms, calls, None, None, None)
+                 for name, (ms, calls) in self.stages.items()]
+        rows += [(run_key, recorded_at, "ticker", ticker, t["ms"], t["attempts"], t["bytes"], t["source"], int(t["ok"]))
+                 for ticker, t in self.tickers.items()]
+        with db.conn:
+            db.conn.executemany('''
+                INSERT INTO run_metrics (run_key, recorded_at, kind, name, ms, count, bytes, source, ok)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+
+
+def timed(stage):
+    """Decorator timing a method into `self.metrics` under `stage`; works on sync and async methods."""
+    def decorate(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(self, *args, **kwargs):
+                with self.metrics.stage(stage):
+                    return await func(self, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.stage(stage):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorate
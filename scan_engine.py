@@ -0,0 +1,401 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright
+
+from fetch_scheduler import FetchScheduler
+from quotes import Quote, parse_change_strip
+from run_metrics import RunMetrics
+
+# Quote pages only need their markup and first-party scripts to fill in the QuoteStrip
+DEFAULT_BLOCKED_TYPES = frozenset({"image", "media", "font"})
+DEFAULT_ALLOW_DOMAINS = ("cnbc.com", "cnbcfm.com")
+DEFAULT_DENY_DOMAINS = (
+    "doubleclick.net", "googlesyndication.com", "googletagservices.com", "google-analytics.com",
+    "googletagmanager.com", "amazon-adsystem.com", "adnxs.com", "scorecardresearch.com",
+    "chartbeat.com", "chartbeat.net", "taboola.com", "outbrain.com", "facebook.net",
+    "krxd.net", "moatads.com", "permutive.com", "onetrust.com", "cookielaw.org", "jwplayer.com",
+)
+
+
+# Reads the whole QuoteStrip (and the summary table) in one round trip. Text
+# is returned raw and parsed on the Python side by Quote.from_record, except
+# the change direction, which only the element class tells us.
+EXTRACT_QUOTE_JS = """
+() => {
+    const text = (root, sel) => {
+        const el = root.querySelector(sel);
+        return el ? el.innerText.trim() : null;
+    };
+    const down = document.querySelector('.QuoteStrip-changeDown');
+    const up = document.querySelector('.QuoteStrip-changeUp');
+    const stats = {};
+    document.querySelectorAll('.Summary-stat').forEach(el => {
+        const label = text(el, '.Summary-label');
+        const value = text(el, '.Summary-value');
+        if (label && value) stats[label.toLowerCase()] = value;
+    });
+    return {
+        price: text(document, '.QuoteStrip-lastPrice'),
+        change_text: (down || up) ? (down || up).innerText.trim() : null,
+        change_down: !!down,
+        prev_close: stats['prev close'] || stats['previous close'] || null,
+        volume: stats['volume'] || null,
+        quote_time: text(document, '.QuoteStrip-lastTradeTime') || text(document, '.QuoteStrip-lastTimeAndPriceContainer'),
+    };
+}
+"""
+
+
+def _host_matches(host, domains):
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+class RequestFilter:
+    """Decides which requests a quote page may make.
+
+    Blocks the listed resource types, anything on the deny list, and (with
+    `block_third_party`) every host that isn't on the allow list.
+    """
+
+    def __init__(self, blocked_types=DEFAULT_BLOCKED_TYPES, allow_domains=DEFAULT_ALLOW_DOMAINS,
+                 deny_domains=DEFAULT_DENY_DOMAINS, block_third_party=True):
+        self.blocked_types = frozenset(blocked_types)
+        self.allow_domains = tuple(allow_domains)
+        self.deny_domains = tuple(deny_domains)
+        self.block_third_party = block_third_party
+
+    def allow(self, *domains):
+        self.allow_domains += tuple(d for d in domains if d)
+
+    def should_block(self, url, resource_type):
+        host = urlparse(url).hostname
+        if not host:
+            # data:, about:blank and friends never hit the network
+            return False
+        if resource_type in self.blocked_types:
+            return True
+        if _host_matches(host, self.deny_domains):
+            return True
+        return self.block_third_party and not _host_matches(host, self.allow_domains)
+
+
+class PageLoadStats:
+    """Requests, blocked requests, transferred bytes and load time (with its goto/selector/evaluate split) for one quote page.
+
+    A fresh one is made per fetch. `pending` holds the response-size lookups
+    still running for its requests.
+    """
+
+    __slots__ = ("requests", "blocked", "bytes", "load_ms", "goto_ms", "wait_ms", "eval_ms", "pending")
+
+    def __init__(self):
+        self.requests = 0
+        self.blocked = 0
+        self.bytes = 0
+        self.load_ms = 0.0
+        self.goto_ms = 0.0
+        self.wait_ms = 0.0
+        self.eval_ms = 0.0
+        self.pending = set()
+
+
+class HostRateLimiter:
+    """Spaces out navigations to the same host by at least `min_interval` seconds."""
+
+    def __init__(self, min_interval=0.25):
+        self.min_interval = min_interval
+        self._next_slot = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, url):
+        host = urlparse(url).netloc
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class PagePool:
+    """A bounded pool of pages, each living in its own browser context.
+
+    Pages are created lazily up to `size`; callers beyond that wait for a
+    page to be handed back, which is what bounds scan concurrency.
+    """
+
+    def __init__(self, browser, size=4, setup=None):
+        self.browser = browser
+        self.size = max(1, size)
+        # Optional coroutine run on each new (context, page), e.g. to install routing
+        self.setup = setup
+        self._idle = asyncio.Queue()
+        self._contexts = []
+        self._created = 0
+
+    async def _new_page(self):
+        context = await self.browser.new_context()
+        self._contexts.append(context)
+        page = await context.new_page()
+        if self.setup is not None:
+            await self.setup(context, page)
+        return page
+
+    @asynccontextmanager
+    async def page(self):
+        if self._idle.empty() and self._created < self.size:
+            self._created += 1
+            page = await self._new_page()
+        else:
+            page = await self._idle.get()
+        try:
+            yield page
+        finally:
+            self._idle.put_nowait(page)
+
+    async def close(self):
+        for context in self._contexts:
+            await context.close()
+        self._contexts = []
+
+
+class BrowserQuoteSource:
+    """Adapts the engine's Chromium path to the quote source interface the scheduler expects."""
+
+    name = "browser"
+
+    def __init__(self, engine):
+        self.engine = engine
+        # Ceiling for one attempt: a full navigation plus the selector wait
+        self.timeout = engine.nav_timeout_ms / 1000 + 5
+
+    def quote_url(self, ticker):
+        return self.engine.quote_url.format(ticker=ticker)
+
+    async def fetch_quote(self, ticker):
+        return await self.engine._fetch_quote_browser(ticker)
+
+
+class AsyncScanEngine:
+    """Fetches quotes concurrently, trying each provider before falling back to Chromium.
+
+    The browser is only launched the first time a page is actually needed,
+    so a scan that the providers fully cover never starts Chromium. Retries,
+    timeouts, circuit breaking and hedging are handled by a `FetchScheduler`
+    over the providers plus the browser, so no ticker takes longer than
+    `fetch_deadline` seconds.
+    """
+
+    QUOTE_URL = "https://www.cnbc.com/quotes/{ticker}"
+
+    def __init__(self, headless=True, concurrency=4, min_host_interval=0.25,
+                 providers=None, quote_url=QUOTE_URL, request_filter=None,
+                 wait_until="domcontentloaded", nav_timeout_ms=15000,
+                 attempts=2, fetch_deadline=30.0, hedge=False, metrics=None, browser_fallback=True):
+        self.headless = headless
+        self.concurrency = concurrency
+        self.providers = list(providers or [])
+        self.quote_url = quote_url
+        self.logger = logging.getLogger()
+
+        # Page-load budget: stop at DOMContentLoaded and give up on slow navigations
+        self.wait_until = wait_until
+        self.nav_timeout_ms = nav_timeout_ms
+        self.request_filter = request_filter if request_filter is not None else RequestFilter()
+        self.request_filter.allow(urlparse(quote_url.format(ticker="X")).hostname)
+        self._page_stats = {}
+        # Per-ticker network cost of browser fetches, for logs and run metrics
+        self.load_stats = {}
+        self.metrics = metrics if metrics is not None else RunMetrics()
+
+        self.rate_limiter = HostRateLimiter(min_host_interval)
+        sources = self.providers + ([BrowserQuoteSource(self)] if browser_fallback or not self.providers else [])
+        self.scheduler = FetchScheduler(sources,
+                                        rate_limiter=self.rate_limiter, attempts=attempts,
+                                        deadline=fetch_deadline, hedge=hedge)
+        self._slots = asyncio.Semaphore(max(1, concurrency))
+        self._launch_lock = asyncio.Lock()
+        self._playwright = None
+        self.browser = None
+        self.pool = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        for provider in self.providers:
+            await provider.close()
+        if self.browser is not None:
+            await self.pool.close()
+            await self.browser.close()
+            self.browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _ensure_browser(self):
+        async with self._launch_lock:
+            if self.browser is None:
+                self.logger.info("🌐 Launching Chromium...")
+                with self.metrics.stage("browser_launch"):
+                    self._playwright = await self._start_driver()
+                    try:
+                        self.browser = await self._playwright.chromium.launch(headless=self.headless)
+                    except BaseException:
+                        # A failed or cancelled launch would otherwise leave the driver running,
+                        # and the next attempt would start another one
+                        await self._playwright.stop()
+                        self._playwright = None
+                        raise
+                self.pool = PagePool(self.browser, self.concurrency, setup=self._setup_page)
+
+    async def _start_driver(self):
+        # Shielded so a deadline can't cancel it halfway, with the driver process
+        # already running but no handle left to stop it
+        starting = asyncio.ensure_future(async_playwright().start())
+        try:
+            return await asyncio.shield(starting)
+        except asyncio.CancelledError:
+            playwright = await starting
+            await playwright.stop()
+            raise
+
+    async def _setup_page(self, context, page):
+        self._page_stats[page] = PageLoadStats()
+        # Each request counts for the fetch that issued it, even if it
+        # finishes after that fetch returned and the page moved on
+        owners = {}
+
+        async def route(route):
+            request = route.request
+            if self.request_filter.should_block(request.url, request.resource_type):
+                self._page_stats[page].blocked += 1
+                await route.abort()
+            else:
+                await route.continue_()
+
+        def on_request(request):
+            owners[request] = self._page_stats[page]
+
+        async def on_finished(request):
+            stats = owners.pop(request, None)
+            if stats is None:
+                return
+            stats.requests += 1
+            task = asyncio.current_task()
+            stats.pending.add(task)
+            try:
+                sizes = await request.sizes()
+                stats.bytes += sizes["responseHeadersSize"] + max(sizes["responseBodySize"], 0)
+            except PlaywrightError:
+                pass
+            finally:
+                stats.pending.discard(task)
+
+        await context.route("**/*", route)
+        page.on("request", on_request)
+        page.on("requestfinished", on_finished)
+        page.on("requestfailed", lambda request: owners.pop(request, None))
+        page.set_default_navigation_timeout(self.nav_timeout_ms)
+
+    @asynccontextmanager
+    async def page(self):
+        await self._ensure_browser()
+        async with self.pool.page() as page:
+            yield page
+
+    def _quote_from_record(self, ticker, record):
+        if record.get("change_text"):
+            change, change_pct = parse_change_strip(record["change_text"], negative=record["change_down"])
+        else:
+            # No changeUp/changeDown element: unchanged on the day
+            change, change_pct = 0.0, 0.0
+        record = dict(record, change=change, change_pct=change_pct)
+        return Quote.from_record(ticker, record, source="browser")
+
+    async def _extract_quote(self, page, ticker, stats):
+        # One attempt; the scheduler owns timeouts and retries
+        mark = time.perf_counter()
+        await page.goto(self.quote_url.format(ticker=ticker), wait_until=self.wait_until)
+        stats.goto_ms, mark = (time.perf_counter() - mark) * 1000, time.perf_counter()
+        try:
+            await page.wait_for_selector(".QuoteStrip-lastPrice", timeout=5000)
+        except PlaywrightTimeoutError:
+            # The page loaded without a quote strip: nothing to read for this ticker
+            self.logger.warning(f"No quote strip on the {ticker} page")
+            return None
+        stats.wait_ms, mark = (time.perf_counter() - mark) * 1000, time.perf_counter()
+        record = await page.evaluate(EXTRACT_QUOTE_JS)
+        stats.eval_ms = (time.perf_counter() - mark) * 1000
+        return self._quote_from_record(ticker, record)
+
+    async def _fetch_quote_browser(self, ticker):
+        async with self.page() as page:
+            stats = self._page_stats[page] = PageLoadStats()
+            start = time.perf_counter()
+            try:
+                quote = await self._extract_quote(page, ticker, stats)
+            finally:
+                stats.load_ms = (time.perf_counter() - start) * 1000
+                self.load_stats[ticker] = stats
+                self.metrics.add("page_goto", stats.goto_ms)
+                self.metrics.add("page_wait_selector", stats.wait_ms)
+                self.metrics.add("page_evaluate", stats.eval_ms)
+        # Let the size lookups of requests that already finished land before reporting
+        if stats.pending:
+            await asyncio.wait(set(stats.pending), timeout=1.0)
+        self.logger.info(f"📦 {ticker}: {stats.requests} requests, {stats.bytes / 1024:,.0f} KB, "
+                         f"{stats.blocked} blocked, {stats.load_ms:,.0f} ms")
+        return quote
+
+    def ticker_bytes(self, ticker):
+        """Bytes transferred for a ticker's latest fetch, across the browser and any providers."""
+        total = self.load_stats[ticker].bytes if ticker in self.load_stats else 0
+        return total + sum(getattr(p, "bytes_by_ticker", {}).get(ticker, 0) for p in self.providers)
+
+    async def fetch_quote(self, ticker, on_quote=None):
+        self.load_stats.pop(ticker, None)
+        for provider in self.providers:
+            getattr(provider, "bytes_by_ticker", {}).pop(ticker, None)
+        async with self._slots:
+            quote = await self.scheduler.fetch(ticker)
+        # Latency is time spent in attempts; host rate-limit queueing is tracked as its own stage
+        self.metrics.add("rate_limit_wait", self.scheduler.wait_by_ticker[ticker] * 1000)
+        self.metrics.record_ticker(ticker, self.scheduler.latency_by_ticker[ticker] * 1000,
+                                   self.scheduler.attempts_by_ticker[ticker],
+                                   source=quote.source if quote is not None else None,
+                                   bytes=self.ticker_bytes(ticker), ok=quote is not None)
+        if on_quote is not None:
+            on_quote(ticker, quote)
+        return quote
+
+    async def fetch_all(self, tickers, on_quote=None):
+        """Fetch every ticker concurrently; returns {ticker: Quote or None}.
+
+        `on_quote(ticker, quote)` is called as each ticker finishes, e.g. to checkpoint it.
+        """
+        results = await asyncio.gather(*(self.fetch_quote(t, on_quote) for t in tickers))
+        browser_stats = [self.load_stats[t] for t in tickers if t in self.load_stats]
+        if browser_stats:
+            self.logger.info(f"🌐 Browser fetched {len(browser_stats)} quotes: "
+                             f"{sum(s.requests for s in browser_stats)} requests, "
+                             f"{sum(s.bytes for s in browser_stats) / 1024:,.0f} KB, "
+                             f"{sum(s.blocked for s in browser_stats)} blocked")
+        for line in self.scheduler.summary():
+            self.logger.info(f"📡 {line}")
+        missing = [t for t, quote in zip(tickers, results) if quote is None]
+        if missing:
+            self.logger.warning(f"⚠️ No quote for {len(missing)} ticker(s): {', '.join(missing)}")
+        return dict(zip(tickers, results))
+
+    async def screenshot_html(self, html, path, selector=".container"):
+        async with self.page() as page:
+            await page.set_content(html)
+            await asyncio.sleep(0.5)
+            await page.locator(selector).screenshot(path=path)
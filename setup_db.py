@@ -1,30 +1,13 @@
-
-import sqlite3
+from portfolio_db import PortfolioDB, SCHEMA_VERSION
 
 def init_db():
-    # Connect to a file named 'portfolio.db'. 
+    # Connect to a file named 'portfolio.db'.
     # If it doesn't exist, Python creates it automatically.
-    conn = sqlite3.connect('portfolio.db')
-    cursor = conn.cursor()
-
-    # Create a table to hold the snapshots
-    # We store: Timestamp, Ticker, Price, Shares, and News
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS portfolio_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            scan_time TEXT,
-            ticker TEXT,
-            price REAL,
-            shares REAL,
-            value REAL,
-            news_headline TEXT
-        )
-    ''')
-
-    # Commit the changes and close
-    conn.commit()
-    conn.close()
-    print("✅ Database 'portfolio.db' created successfully.")
+    # PortfolioDB creates the tables (or migrates an older layout in place)
+    # and stamps the schema version.
+    db = PortfolioDB('portfolio.db')
+    db.close()
+    print(f"✅ Database 'portfolio.db' ready (schema v{SCHEMA_VERSION}).")
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    init_db()
@@ -0,0 +1,102 @@
+"""Alert thresholds fire in the right direction, once, and re-arm when they clear.
+
+    python -m pytest -q test_alerts.py
+"""
+import pytest
+
+from alerts import AlertEngine, AlertRule, RuleIndex
+from portfolio_db import PortfolioDB
+from quotes import Quote
+
+
+class FakeNotifier:
+    def __init__(self):
+        self.messages = []
+
+    def submit(self, message):
+        self.messages.append(message)
+
+
+RULES = [
+    AlertRule("MSFT", "price_above", 400),
+    AlertRule("MSFT", "price_above", 450),
+    AlertRule("MSFT", "price_below", 300),
+    AlertRule("NVDA", "price_below", 100, note="buy zone"),
+    AlertRule("*", "day_move", 5),
+    AlertRule("*", "weight_above", 50, portfolio="ira"),
+]
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = PortfolioDB(str(tmp_path / "portfolio.db"))
+    yield db
+    db.close()
+
+
+def _ids(rules):
+    return sorted(rule.id for rule in rules)
+
+
+def test_thresholds_fire_in_their_direction():
+    index = RuleIndex(RULES)
+    assert _ids(index.matches("MSFT", "price", 350)) == []
+    # Reaching a threshold counts; only the thresholds crossed fire
+    assert _ids(index.matches("MSFT", "price", 400)) == ["MSFT:price_above:400"]
+    assert _ids(index.matches("MSFT", "price", 500)) == ["MSFT:price_above:400", "MSFT:price_above:450"]
+    assert _ids(index.matches("MSFT", "price", 299.99)) == ["MSFT:price_below:300"]
+    # Rules for one ticker never fire for another
+    assert _ids(index.matches("NVDA", "price", 500)) == []
+    assert _ids(index.matches("NVDA", "price", 99)) == ["NVDA:price_below:100"]
+
+
+def test_wildcard_rules_match_every_ticker():
+    index = RuleIndex(RULES)
+    assert _ids(index.matches("UBER", "day_move", 6.0)) == ["*:day_move:5"]
+    assert _ids(index.matches("MSFT", "day_move", 4.9)) == []
+
+
+def test_alert_fires_once_across_restarts(db):
+    notifier = FakeNotifier()
+    engine = AlertEngine(db, RULES, notifier)
+    engine.check_quote(Quote("NVDA", 95.0, change_pct=-1.0))
+    assert engine.flush() == 1
+    assert notifier.messages == ["🚨 **NVDA** at $95.00, below $100.00 — buy zone"]
+
+    # Same condition on the next poll, and after a restart on the same database
+    engine.check_quote(Quote("NVDA", 94.0, change_pct=-1.5))
+    assert engine.flush() == 0
+    restarted = AlertEngine(db, RULES, notifier)
+    restarted.check_quote(Quote("NVDA", 93.0, change_pct=-2.0))
+    assert restarted.flush() == 0
+    assert len(notifier.messages) == 1
+
+
+def test_alert_rearms_after_clearing(db):
+    notifier = FakeNotifier()
+    engine = AlertEngine(db, RULES, notifier)
+    for price in (95.0, 105.0, 98.0):
+        engine.check_quote(Quote("NVDA", price, change_pct=0.0))
+        engine.flush()
+    assert len(notifier.messages) == 2
+    assert db.conn.execute("SELECT active, value FROM alert_state WHERE rule_id = 'NVDA:price_below:100'"
+                           ).fetchall() == [(1, 98.0)]
+
+
+def test_stale_quotes_are_ignored(db):
+    engine = AlertEngine(db, RULES, FakeNotifier())
+    engine.check_quote(Quote("NVDA", 50.0, stale=True))
+    assert engine.flush() == 0
+
+
+def test_position_rules_are_scoped_to_their_portfolio(db):
+    notifier = FakeNotifier()
+    engine = AlertEngine(db, RULES, notifier)
+    # 60% of equity, and nothing below cost basis
+    rows = [{"ticker": "VTI", "value": 600.0, "total_gain": 100.0},
+            {"ticker": "BND", "value": 400.0, "total_gain": 0.0}]
+    engine.check_positions("portfolio", rows, 1000.0)
+    assert engine.flush() == 0
+    engine.check_positions("ira", rows, 1000.0)
+    assert engine.flush() == 1
+    assert notifier.messages == ["🚨 **VTI** is 60.0% of equity (limit 50%) (ira)"]
@@ -0,0 +1,78 @@
+"""An exported archive stands in for history the database no longer has.
+
+    python -m pytest -q test_analytics.py
+"""
+import numpy as np
+import pytest
+
+import analytics
+from compact_db import export_archive, load_archive
+from portfolio_db import PortfolioDB
+
+TICKERS = ("UBER", "MSFT", "VTI")
+
+
+def _daily_history(db, days):
+    rng = np.random.default_rng(7)
+    value = np.array([600.0, 740.0, 720.0])
+    rows = []
+    for day in days:
+        change_pct = rng.normal(0.0, 1.5, len(TICKERS))
+        value = value * (1 + change_pct / 100)
+        rows += [("portfolio", str(day), t, 1.0, 1.0, 1.0, 1.0, 1.0, float(v), float(c), 1)
+                 for t, v, c in zip(TICKERS, value, change_pct)]
+    with db.conn:
+        db.conn.executemany('''
+            INSERT INTO history_daily (portfolio, day, ticker, open, high, low, close, shares, value, change_pct, samples)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+
+@pytest.fixture
+def days():
+    days = np.arange(np.datetime64("2024-01-02"), np.datetime64("2024-05-01"))
+    return days[analytics._trading_day_mask(days)]
+
+
+def test_archive_fills_in_dropped_days(tmp_path, days):
+    full = PortfolioDB(str(tmp_path / "full.db"))
+    _daily_history(full, days)
+    expected = analytics.performance_stats(full, "portfolio")
+    export_archive(full, str(tmp_path / "history.npz"))
+    full.close()
+
+    # A database that only kept the last 30 trading days
+    recent = PortfolioDB(str(tmp_path / "recent.db"))
+    _daily_history(recent, days)
+    with recent.conn:
+        recent.conn.execute("DELETE FROM history_daily WHERE day < ?", (str(days[-30]),))
+    archive = load_archive(str(tmp_path / "history.npz"))
+    try:
+        without = analytics.performance_stats(recent, "portfolio")
+        merged = analytics.performance_stats(recent, "portfolio", archive=archive)
+    finally:
+        recent.close()
+
+    assert len(without.returns) == 30
+    np.testing.assert_array_equal(merged.days, expected.days)
+    np.testing.assert_allclose(merged.returns, expected.returns)
+    assert merged.twr_total == pytest.approx(expected.twr_total)
+    assert merged.max_drawdown == pytest.approx(expected.max_drawdown)
+    assert merged.summary_line() == expected.summary_line()
+    assert merged.twr_total != pytest.approx(without.twr_total)
+
+
+def test_archive_alone_is_enough(tmp_path, days):
+    source = PortfolioDB(str(tmp_path / "full.db"))
+    _daily_history(source, days)
+    expected = analytics.performance_stats(source, "portfolio")
+    export_archive(source, str(tmp_path / "history.npz"))
+    source.close()
+
+    empty = PortfolioDB(str(tmp_path / "empty.db"))
+    try:
+        assert analytics.performance_stats(empty, "portfolio") is None
+        stats = analytics.performance_stats(empty, "portfolio", archive=load_archive(str(tmp_path / "history.npz")))
+    finally:
+        empty.close()
+    assert stats.twr_total == pytest.approx(expected.twr_total)
@@ -0,0 +1,58 @@
+"""Circuit breaking: only a failing source trips it, not tickers it can't read.
+
+    python -m pytest -q test_fetch_scheduler.py
+"""
+import asyncio
+
+from fetch_scheduler import CLOSED, OPEN, FetchScheduler
+from quotes import Quote
+
+
+class FakeSource:
+    name = "fake"
+    timeout = 1.0
+
+    def __init__(self, unreadable=(), failing=False):
+        self.unreadable = set(unreadable)
+        self.failing = failing
+        self.requests = 0
+
+    def quote_url(self, ticker):
+        return f"http://quotes.test/{ticker}"
+
+    async def fetch_quote(self, ticker):
+        self.requests += 1
+        if self.failing:
+            raise ConnectionError("connection refused")
+        if ticker in self.unreadable:
+            return None
+        return Quote(ticker, 100.0)
+
+
+def _fetch_all(scheduler, tickers):
+    async def run():
+        return [await scheduler.fetch(t) for t in tickers]
+    return asyncio.run(run())
+
+
+def test_unreadable_tickers_dont_open_the_breaker():
+    tickers = [f"T{i:02d}" for i in range(40)]
+    # More unreadable tickers in a row than the breaker threshold
+    source = FakeSource(unreadable=tickers[:16])
+    scheduler = FetchScheduler([source], attempts=1, breaker_threshold=5)
+
+    quotes = _fetch_all(scheduler, tickers)
+
+    assert scheduler.breakers["fake"].state == CLOSED
+    assert source.requests == 40
+    assert [q is not None for q in quotes] == [False] * 16 + [True] * 24
+
+
+def test_source_errors_open_the_breaker():
+    source = FakeSource(failing=True)
+    scheduler = FetchScheduler([source], attempts=1, breaker_threshold=5)
+
+    assert _fetch_all(scheduler, [f"T{i}" for i in range(10)]) == [None] * 10
+    assert scheduler.breakers["fake"].state == OPEN
+    # Tickers after the fifth failure skip the source without a request
+    assert source.requests == 5
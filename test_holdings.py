@@ -0,0 +1,69 @@
+"""Per-lot gains: FIFO ordering, partial FIFO sales and specific-lot identification.
+
+    python -m pytest -q test_holdings.py
+"""
+import datetime
+
+import numpy as np
+import pytest
+
+from holdings import Holdings
+
+PORTFOLIO = {
+    # File order is deliberately not acquisition order
+    "MSFT": [
+        {"shares": 5, "price": 300.0, "date": "2023-06-01"},
+        {"shares": 10, "price": 200.0, "date": "2021-03-15"},
+        {"shares": 2, "price": 400.0},
+        {"shares": 3, "price": 250.0, "date": "2022-01-10"},
+    ],
+    "VTI": {"shares": 4, "cost": 220.0},
+}
+
+
+@pytest.fixture
+def holdings():
+    return Holdings.from_portfolio_json(PORTFOLIO)
+
+
+def test_lots_are_fifo(holdings):
+    lots = holdings.lots("MSFT")
+    # Dated lots oldest first, then undated lots in file order
+    assert [(lot.shares, lot.price) for lot in lots] == [(10, 200.0), (3, 250.0), (5, 300.0), (2, 400.0)]
+    assert [lot.acquired for lot in lots] == [datetime.date(2021, 3, 15), datetime.date(2022, 1, 10),
+                                              datetime.date(2023, 6, 1), None]
+    assert lots[1].cost_basis == 750.0
+    assert lots[1].unrealized_gain(350.0) == 300.0
+    assert [(lot.shares, lot.price) for lot in holdings.lots("VTI")] == [(4, 220.0)]
+
+
+def test_whole_position_gain(holdings):
+    # (350-200)*10 + (350-250)*3 + (350-300)*5 + (350-400)*2
+    assert holdings.unrealized_gain("MSFT", 350.0) == 1500 + 300 + 250 - 100
+
+
+def test_fifo_partial_sale(holdings):
+    # 12 shares FIFO: all 10 of the 2021 lot, then 2 of the 2022 lot
+    assert holdings.unrealized_gain("MSFT", 350.0, shares=12) == 1500 + 200
+    # Exactly the first lot
+    assert holdings.unrealized_gain("MSFT", 350.0, shares=10) == 1500
+    assert holdings.unrealized_gain("MSFT", 350.0, shares=0) == 0
+
+
+def test_fifo_sale_larger_than_position(holdings):
+    with pytest.raises(ValueError, match="only 20 shares held"):
+        holdings.unrealized_gain("MSFT", 350.0, shares=21)
+
+
+def test_specific_lots(holdings):
+    # Lots are named by FIFO position: 2 is the 2023 lot, 3 the undated one
+    assert holdings.unrealized_gain("MSFT", 350.0, lots=[2, 3]) == 250 - 100
+    # FIFO within the chosen lots, whatever order they're listed in: 4 of the 2023 lot's 5 shares
+    assert holdings.unrealized_gain("MSFT", 350.0, lots=[3, 2], shares=4) == 200
+    assert holdings.unrealized_gain("MSFT", 350.0, lots=[3, 2], shares=6) == 250 - 50
+
+
+def test_lot_gains(holdings):
+    gains = holdings.lot_gains({"MSFT": 350.0})
+    # File order, NaN where the ticker has no price
+    np.testing.assert_array_equal(gains, [250.0, 1500.0, -100.0, 300.0, np.nan])
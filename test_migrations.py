@@ -0,0 +1,108 @@
+"""Legacy portfolio.db layouts must upgrade in place without losing or changing history.
+
+    python -m pytest -q test_migrations.py
+"""
+import sqlite3
+
+import pytest
+
+from portfolio_db import DEFAULT_PORTFOLIO, SCHEMA_VERSION, PortfolioDB, parse_pct
+
+
+def _legacy_db(path, change_column):
+    """A database as the original setup_db.py ('news_headline') or PortfolioManager ('change_pct TEXT') left it."""
+    conn = sqlite3.connect(path)
+    conn.execute(f'''
+        CREATE TABLE portfolio_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scan_time TEXT,
+            ticker TEXT,
+            price REAL,
+            shares REAL,
+            value REAL,
+            {change_column} TEXT
+        )
+    ''')
+    return conn
+
+
+def _history(db):
+    return db.conn.execute('''
+        SELECT id, scan_id, portfolio, scan_time, ticker, price, shares, value, change_pct, news_headline
+        FROM portfolio_history ORDER BY id
+    ''').fetchall()
+
+
+def _networth(db):
+    return db.conn.execute("SELECT portfolio, day, total_value FROM daily_networth ORDER BY day").fetchall()
+
+
+def test_news_headline_layout(tmp_path):
+    path = str(tmp_path / "portfolio.db")
+    conn = _legacy_db(path, "news_headline")
+    conn.executemany("INSERT INTO portfolio_history (scan_time, ticker, price, shares, value, news_headline) "
+                     "VALUES (?, ?, ?, ?, ?, ?)", [
+                         ("2024-01-02 16:00:00", "UBER", 60.0, 10, 600.0, "Uber beats"),
+                         ("2024-01-02 16:00:00", "MSFT", 370.0, 2, 740.0, None),
+                         # Later scan the same day replaces UBER's value for the day
+                         ("2024-01-02 18:00:00", "UBER", 61.0, 10, 610.0, "Uber rallies"),
+                         ("2024-01-03 16:00:00", "UBER", 62.0, 10, 620.0, None),
+                         # Unusable rows are dropped
+                         (None, "UBER", 1.0, 1, 1.0, None),
+                         ("2024-01-03 16:00:00", None, 1.0, 1, 1.0, None),
+                     ])
+    conn.commit()
+    conn.close()
+
+    db = PortfolioDB(path)
+    try:
+        assert db.schema_version == SCHEMA_VERSION
+        assert _history(db) == [
+            (1, None, DEFAULT_PORTFOLIO, "2024-01-02 16:00:00", "UBER", 60.0, 10.0, 600.0, None, "Uber beats"),
+            (2, None, DEFAULT_PORTFOLIO, "2024-01-02 16:00:00", "MSFT", 370.0, 2.0, 740.0, None, None),
+            (3, None, DEFAULT_PORTFOLIO, "2024-01-02 18:00:00", "UBER", 61.0, 10.0, 610.0, None, "Uber rallies"),
+            (4, None, DEFAULT_PORTFOLIO, "2024-01-03 16:00:00", "UBER", 62.0, 10.0, 620.0, None, None),
+        ]
+        assert _networth(db) == [
+            (DEFAULT_PORTFOLIO, "2024-01-02", 610.0 + 740.0),
+            (DEFAULT_PORTFOLIO, "2024-01-03", 620.0),
+        ]
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("text", ["+1.23%", "-0.45%", "UNCH", "1,234.5%", "-1,000%", "", None])
+def test_change_pct_text_layout(tmp_path, text):
+    path = str(tmp_path / "portfolio.db")
+    conn = _legacy_db(path, "change_pct")
+    conn.execute("INSERT INTO portfolio_history (scan_time, ticker, price, shares, value, change_pct) "
+                 "VALUES ('2024-01-02 16:00:00', 'VTI', 240.0, 3, 720.0, ?)", (text,))
+    conn.commit()
+    conn.close()
+
+    db = PortfolioDB(path)
+    try:
+        # The migrated value matches what a new write of the same label stores
+        assert _history(db) == [(1, None, DEFAULT_PORTFOLIO, "2024-01-02 16:00:00", "VTI", 240.0, 3.0, 720.0,
+                                 parse_pct(text), None)]
+        assert _networth(db) == [(DEFAULT_PORTFOLIO, "2024-01-02", 720.0)]
+    finally:
+        db.close()
+
+
+def test_migration_is_idempotent(tmp_path):
+    path = str(tmp_path / "portfolio.db")
+    conn = _legacy_db(path, "change_pct")
+    conn.execute("INSERT INTO portfolio_history (scan_time, ticker, price, shares, value, change_pct) "
+                 "VALUES ('2024-01-02 16:00:00', 'VTI', 240.0, 3, 720.0, '+0.50%')")
+    conn.commit()
+    conn.close()
+
+    PortfolioDB(path).close()
+    db = PortfolioDB(path)
+    try:
+        assert db.schema_version == SCHEMA_VERSION
+        assert len(_history(db)) == 1
+        assert _networth(db) == [(DEFAULT_PORTFOLIO, "2024-01-02", 720.0)]
+    finally:
+        db.close()
@@ -0,0 +1,75 @@
+"""Resumed runs: rewriting a run's scan must not add history, and only good quotes are checkpointed.
+
+    python -m pytest -q test_resume.py
+"""
+from datetime import datetime
+
+import pytest
+
+from history_graph import update_daily_rollup
+from portfolio_db import DEFAULT_PORTFOLIO, PortfolioDB
+from quotes import Quote
+
+RUN_KEY = "2024-01-02:42"
+STARTED = datetime(2024, 1, 2, 16, 0)
+
+
+def _row(ticker, price, shares, pct="+1.00%"):
+    return {"ticker": ticker, "price": price, "shares": shares, "value": price * shares, "pct_change": pct}
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = PortfolioDB(str(tmp_path / "portfolio.db"))
+    yield db
+    db.close()
+
+
+def test_rewriting_a_run_updates_its_scan_in_place(db):
+    first = [_row("UBER", 60.0, 10), _row("MSFT", 370.0, 2), _row("VTI", 240.0, 3)]
+    scan_id = db.write_scan(STARTED, first, 2060.0, 0.0, 20.0, 1.0, run_key=RUN_KEY, missing_count=1)
+    update_daily_rollup(db)
+
+    # The rerun refetched UBER, and VTI left the portfolio
+    second = [_row("UBER", 62.0, 10, "+3.33%"), _row("MSFT", 370.0, 2)]
+    assert db.write_scan(datetime(2024, 1, 2, 16, 30), second, 1360.0, 0.0, 40.0, 3.0,
+                         run_key=RUN_KEY, missing_count=0) == scan_id
+    update_daily_rollup(db)
+
+    assert db.conn.execute("SELECT id, started_at, ticker_count, missing_count, total_equity FROM scans "
+                           "WHERE run_key = ? AND portfolio = ?", (RUN_KEY, DEFAULT_PORTFOLIO)).fetchall() == [
+        (scan_id, "2024-01-02 16:00:00", 2, 0, 1360.0)]
+    assert db.conn.execute("SELECT scan_id, scan_time, ticker, price, value, change_pct FROM portfolio_history "
+                           "ORDER BY ticker").fetchall() == [
+        (scan_id, "2024-01-02 16:00:00", "MSFT", 370.0, 740.0, 1.0),
+        (scan_id, "2024-01-02 16:00:00", "UBER", 62.0, 620.0, 3.33),
+    ]
+    assert db.conn.execute("SELECT portfolio, day, scan_id, total_value, missing_count FROM daily_networth"
+                           ).fetchall() == [(DEFAULT_PORTFOLIO, "2024-01-02", scan_id, 1360.0, 0)]
+
+
+def test_runs_are_kept_apart_per_portfolio(db):
+    rows = [_row("UBER", 60.0, 10)]
+    main = db.write_scan(STARTED, rows, 600.0, 0.0, 6.0, 1.0, run_key=RUN_KEY)
+    ira = db.write_scan(STARTED, rows, 600.0, 0.0, 6.0, 1.0, run_key=RUN_KEY, portfolio="ira")
+    assert main != ira
+    assert db.conn.execute("SELECT COUNT(*) FROM portfolio_history").fetchone()[0] == 2
+
+
+def test_only_good_quotes_are_resumed(db):
+    db.begin_run(RUN_KEY, "2024-01-02", "42", ticker_count=4)
+    db.checkpoint(RUN_KEY, "UBER", Quote("UBER", 62.0, change=2.0, change_pct=3.33, source="http"))
+    db.checkpoint(RUN_KEY, "MSFT", None)
+    db.checkpoint(RUN_KEY, "VTI", Quote("VTI", 240.0, stale=True))
+    # A failed refetch replaces an earlier good checkpoint; a later success replaces a failure
+    db.checkpoint(RUN_KEY, "NVDA", Quote("NVDA", 120.0))
+    db.checkpoint(RUN_KEY, "NVDA", None)
+    db.checkpoint(RUN_KEY, "MSFT", Quote("MSFT", 370.0))
+
+    assert dict(db.conn.execute("SELECT ticker, status FROM scan_checkpoints WHERE run_key = ?", (RUN_KEY,))) == {
+        "UBER": "ok", "MSFT": "ok", "VTI": "failed", "NVDA": "failed"}
+    resumed = db.load_checkpoints(RUN_KEY)
+    assert sorted(resumed) == ["MSFT", "UBER"]
+    uber = resumed["UBER"]
+    assert (uber.price, uber.change, uber.change_pct, uber.source, uber.stale) == (62.0, 2.0, 3.33, "http", False)
+    assert db.finish_run(RUN_KEY) == "partial"
@@ -1,33 +1,211 @@
-
+import argparse
+import csv
+import os
 import sqlite3
-import pandas as pd
-
-def view_data():
-    # 1. Connect to the database
-    conn = sqlite3.connect('portfolio.db')
-    
-    # 2. Run a SQL Query
-    # "SELECT *" means "Grab everything"
-    query = "SELECT * FROM portfolio_history ORDER BY id DESC"
-    
-    # 3. Use Pandas to make it look pretty
+import sys
+
+from portfolio_db import SCHEMA_VERSION
+
+HISTORY_COLUMNS = ["id", "scan_id", "portfolio", "scan_time", "ticker", "price", "shares", "value", "change_pct"]
+
+# Aggregations run entirely in SQL; each returns (column names, query over the filtered history)
+AGGREGATES = {
+    "ticker": (["ticker", "rows", "first_seen", "last_seen", "min_price", "max_price", "avg_price"],
+               "SELECT ticker, COUNT(*), MIN(scan_time), MAX(scan_time), MIN(price), MAX(price), AVG(price) "
+               "FROM portfolio_history {where} GROUP BY ticker ORDER BY ticker"),
+    "day": (["day", "scans", "rows", "tickers"],
+            "SELECT date(scan_time) AS day, COUNT(DISTINCT scan_id), COUNT(*), COUNT(DISTINCT ticker) "
+            "FROM portfolio_history {where} GROUP BY day ORDER BY day DESC"),
+    "scan": (["scan_id", "scan_time", "rows", "value"],
+             "SELECT scan_id, MIN(scan_time), COUNT(*), SUM(value) "
+             "FROM portfolio_history {where} GROUP BY scan_id ORDER BY scan_id DESC"),
+}
+
+
+def connect(path):
+    if not os.path.exists(path):
+        raise SystemExit(f"⚠️ {path} not found. Run the bot first!")
+    # Read-only, so it's safe to browse while a scan is writing (the DB is in WAL mode)
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < SCHEMA_VERSION:
+        conn.close()
+        raise SystemExit(f"⚠️ {path} is at schema v{version}; run `python setup_db.py` to upgrade it first.")
+    return conn
+
+
+def build_filters(args):
+    """WHERE clause and params for the history filters; all of them can use an index."""
+    clauses, params = [], []
+    if args.ticker:
+        clauses.append(f"ticker IN ({','.join('?' * len(args.ticker))})")
+        params += [t.upper() for t in args.ticker]
+    if args.portfolio:
+        clauses.append("portfolio = ?")
+        params.append(args.portfolio)
+    if args.scan is not None:
+        clauses.append("scan_id = ?")
+        params.append(args.scan)
+    if args.since:
+        clauses.append("scan_time >= ?")
+        params.append(args.since)
+    if args.until:
+        # A bare date includes that whole day
+        clauses.append("scan_time < ?" if len(args.until) > 10 else "scan_time < date(?, '+1 day')")
+        params.append(args.until)
+    return clauses, params
+
+
+def history_query(conn, args):
+    clauses, params = build_filters(args)
+    if args.before_id is not None:
+        # Keyset pagination: continue strictly after the last row of the previous page.
+        # (scan_time, id) matches the index order, so no page ever scans the rows before it.
+        anchor = conn.execute("SELECT scan_time FROM portfolio_history WHERE id = ?", (args.before_id,)).fetchone()
+        if anchor is None:
+            raise SystemExit(f"⚠️ No history row with id {args.before_id}.")
+        clauses.append("(scan_time, id) < (?, ?)")
+        params += [anchor[0], args.before_id]
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    query = (f"SELECT {', '.join(HISTORY_COLUMNS)} FROM portfolio_history {where} "
+             f"ORDER BY scan_time DESC, id DESC LIMIT ? OFFSET ?")
+    return HISTORY_COLUMNS, query, params + [args.limit, args.offset]
+
+
+def aggregate_query(args):
+    clauses, params = build_filters(args)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    columns, query = AGGREGATES[args.agg]
+    return columns, query.format(where=where), params
+
+
+def scans_filters(args):
+    """WHERE clause and params for `--scans`; --ticker keeps the scans that stored a row for it."""
+    clauses, params = [], []
+    if args.ticker:
+        clauses.append(f"id IN (SELECT scan_id FROM portfolio_history "
+                       f"WHERE ticker IN ({','.join('?' * len(args.ticker))}))")
+        params += [t.upper() for t in args.ticker]
+    if args.portfolio:
+        clauses.append("portfolio = ?")
+        params.append(args.portfolio)
+    if args.scan is not None:
+        clauses.append("id = ?")
+        params.append(args.scan)
+    if args.since:
+        clauses.append("started_at >= ?")
+        params.append(args.since)
+    if args.until:
+        clauses.append("started_at < ?" if len(args.until) > 10 else "started_at < date(?, '+1 day')")
+        params.append(args.until)
+    return clauses, params
+
+
+def scans_query(args):
+    clauses, params = scans_filters(args)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    columns = ["id", "portfolio", "scan_type", "run_key", "started_at", "ticker_count", "total_equity", "day_pl", "day_pct"]
+    query = f"SELECT {', '.join(columns)} FROM scans {where} ORDER BY id DESC LIMIT ? OFFSET ?"
+    return columns, query, params + [args.limit, args.offset]
+
+
+def count_query(args):
+    """(label, query, params) counting everything the listing pages through."""
+    if args.scans:
+        clauses, params = scans_filters(args)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return "Matching Scans", f"SELECT COUNT(*) FROM scans {where}", params
+    if args.agg:
+        _, query, params = aggregate_query(args)
+        return f"Matching Groups (per {args.agg})", f"SELECT COUNT(*) FROM ({query})", params
+    clauses, params = build_filters(args)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return "Matching Rows", f"SELECT COUNT(*) FROM portfolio_history {where}", params
+
+
+def _format(value):
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    return "" if value is None else str(value)
+
+
+def print_table(columns, cursor, batch=500):
+    """Stream rows from the cursor, a batch at a time; returns (row count, last row)."""
+    print("-" * 100)
+    print("  ".join(f"{c:>12}" for c in columns))
+    count, last = 0, None
+    while True:
+        rows = cursor.fetchmany(batch)
+        if not rows:
+            break
+        for row in rows:
+            print("  ".join(f"{_format(v):>12}" for v in row))
+        count += len(rows)
+        last = rows[-1]
+    print("-" * 100)
+    return count, last
+
+
+def view_data(argv=None):
+    parser = argparse.ArgumentParser(description="Browse portfolio.db without loading the whole history.")
+    parser.add_argument("--db", default="portfolio.db")
+    parser.add_argument("--ticker", action="append", help="only these tickers (repeatable)")
+    parser.add_argument("--portfolio", help="only this portfolio")
+    parser.add_argument("--scan", type=int, help="only this scan id")
+    parser.add_argument("--since", help="from this date/time (YYYY-MM-DD[ HH:MM:SS])")
+    parser.add_argument("--until", help="up to this date/time; a bare date includes the whole day")
+    parser.add_argument("--limit", type=int, default=20, help="rows per page")
+    parser.add_argument("--offset", type=int, default=0, help="skip this many rows (prefer --before-id for deep pages)")
+    parser.add_argument("--before-id", type=int, help="next page: rows older than this history id")
+    parser.add_argument("--agg", choices=sorted(AGGREGATES), help="aggregate history per ticker, day or scan")
+    parser.add_argument("--scans", action="store_true", help="list scan headers instead of history rows")
+    parser.add_argument("--count", action="store_true", help="also count the rows (or scans, or groups) matching the filters")
+    parser.add_argument("--csv", action="store_true", help="stream rows as CSV to stdout")
+    parser.add_argument("--pandas", action="store_true", help="load the page into a pandas DataFrame and print it")
+    args = parser.parse_args(argv)
+    if args.before_id is not None and (args.scans or args.agg):
+        parser.error("--before-id pages through history rows; use --offset with --scans or --agg")
+    if args.scans and args.agg:
+        parser.error("--scans and --agg can't be combined")
+
+    conn = connect(args.db)
     try:
-        df = pd.read_sql_query(query, conn)
-        
-        if df.empty:
-            print("⚠️ Database is empty. Run the bot first!")
+        if args.scans:
+            columns, query, params = scans_query(args)
+        elif args.agg:
+            columns, query, params = aggregate_query(args)
+            query, params = f"{query} LIMIT ? OFFSET ?", params + [args.limit, args.offset]
         else:
-            print("\n📊 CURRENT DATABASE CONTENTS:")
-            print("-" * 80)
-            # Print the first 20 rows so we don't flood the terminal
-            print(df.head(20).to_string(index=False)) 
-            print("-" * 80)
-            print(f"✅ Total Rows: {len(df)}")
-            
-    except Exception as e:
-        print(f"Error reading database: {e}")
+            columns, query, params = history_query(conn, args)
+
+        if args.pandas:
+            import pandas as pd
+            df = pd.read_sql_query(query, conn, params=params)
+            df.columns = columns
+            print(df.to_string(index=False))
+            return
+
+        cursor = conn.execute(query, params)
+        if args.csv:
+            writer = csv.writer(sys.stdout)
+            writer.writerow(columns)
+            while rows := cursor.fetchmany(500):
+                writer.writerows(rows)
+            return
+
+        print("\n📊 DATABASE CONTENTS:")
+        count, last = print_table(columns, cursor)
+        if count == 0:
+            print("⚠️ No matching rows. Run the bot first, or loosen the filters!")
+        if args.count:
+            label, count_sql, count_params = count_query(args)
+            total = conn.execute(count_sql, count_params).fetchone()[0]
+            print(f"✅ {label}: {total:,}")
+        if count == args.limit and not (args.scans or args.agg):
+            print(f"➡️ Next page: --before-id {last[0]}")
     finally:
         conn.close()
 
+
 if __name__ == "__main__":
-    view_data()
\ No newline at end of file
+    view_data()